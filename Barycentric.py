@@ -0,0 +1,113 @@
+import sys
+import json
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+ARC_FILE = "rcsr3d.arc"
+
+def load_arc(filename=ARC_FILE):
+    """Read the .arc database into a dict mapping each id to its fields (key, version, checksum, ...)"""
+    entries = {}
+    entry = {}
+    with open(filename) as f:
+        for line in f:
+            parts = line.split(None, 1)
+            if not parts:
+                continue
+            if parts[0] == "end":
+                if "id" in entry:
+                    entries[entry["id"]] = entry
+                entry = {}
+            else:
+                entry[parts[0]] = parts[1].strip() if len(parts) > 1 else ""
+    return entries
+
+def parse_key(key):
+    """Split an arc key into its dimension and the (V1, V2, cell offset) edges of the quotient graph, 0-based"""
+    numbers = [int(x) for x in key.split()]
+    dim = numbers[0]
+    edges = np.array(numbers[1:], dtype=int).reshape(-1, 2 + dim)
+    return dim, edges[:, 0] - 1, edges[:, 1] - 1, edges[:, 2:]
+
+def barycentric_positions(n, src, dst, shifts):
+    """Solve the periodic Laplacian system: every vertex sits at the average of its neighbours (vertex 0 at the origin)"""
+    w = np.ones(len(src))
+    L = scipy.sparse.coo_matrix(
+        (np.concatenate([w, w, -w, -w]),
+         (np.concatenate([src, dst, src, dst]), np.concatenate([src, dst, dst, src]))),
+        shape=(n, n)).tocsc()
+    B = np.zeros((n, shifts.shape[1]))
+    np.add.at(B, src, shifts)
+    np.add.at(B, dst, -shifts)
+    positions = np.zeros((n, shifts.shape[1]))
+    if n > 1:
+        sub = L[1:, 1:]
+        positions[1:] = scipy.sparse.linalg.spsolve(sub, B[1:]).reshape(n - 1, -1)
+    if not np.all(np.isfinite(positions)):
+        raise ValueError("Quotient graph is not connected.")
+    return positions
+
+def edge_metric(edge_vectors):
+    """Gram matrix in which the second moment of the edge vectors is isotropic, scaled to unit mean square edge length.
+    It is invariant under all automorphisms of the net, so symmetric nets get their symmetric cell."""
+    moment = edge_vectors.T @ edge_vectors
+    if np.linalg.matrix_rank(moment) < moment.shape[0]:
+        raise ValueError("Edge vectors do not span the lattice.")
+    return len(edge_vectors) / moment.shape[0] * np.linalg.inv(moment)
+
+def arc_network(key):
+    """Compute the barycentric embedding of an arc key in the network_data.json structure of Halfedges.py"""
+    dim, src, dst, shifts = parse_key(key)
+    if dim != 3:
+        raise ValueError("Dimension is not 3.")
+    n = int(max(src.max(), dst.max())) + 1
+    positions = barycentric_positions(n, src, dst, shifts)
+
+    # move vertices into the unit cell and correct the cell offsets
+    cells = np.floor(positions + 1e-9).astype(int)
+    positions = positions - cells
+    shifts = shifts + cells[dst] - cells[src]
+
+    frac = np.round(positions, 9) % 1.0
+    if len(np.unique(np.round(frac, 6), axis=0)) < n:
+        raise ValueError("Barycentric placement has collisions.")
+
+    edge_vectors = positions[dst] + shifts - positions[src]
+    periods = np.linalg.cholesky(edge_metric(edge_vectors))
+    vertices = positions @ periods
+
+    halfedges = []
+    inversions = []
+    for v1, v2, cell in zip(src.tolist(), dst.tolist(), shifts.tolist()):
+        halfedges.append([v1, v2, cell])
+        halfedges.append([v2, v1, [-c for c in cell]])
+        inversions.extend([len(halfedges)-1, len(halfedges) - 2])
+
+    return {
+        "periods": periods.tolist(),
+        "vertices": vertices.tolist(),
+        "halfedges": halfedges,
+        "inversions": inversions,
+        "normals": []
+    }
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python Barycentric.py <network_name>")
+        sys.exit(1)
+
+    network_name = sys.argv[1]
+    entries = load_arc()
+    if network_name not in entries:
+        raise SystemExit(f"Aborted: {network_name} not found in {ARC_FILE}.")
+    output_data = arc_network(entries[network_name]["key"])
+    print("Symbol:", network_name)
+    print("Vertices:", len(output_data["vertices"]))
+    print("Halfedges:", len(output_data["halfedges"]))
+
+    with open("network_data.json", "w") as f:
+        json.dump(output_data, f, indent=2)
+
+if __name__ == "__main__":
+    main()
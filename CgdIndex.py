@@ -0,0 +1,121 @@
+import sys
+import os
+import re
+import json
+import mmap
+
+CGD_FILE = "rcsr3d.cgd"
+
+block_start = re.compile(rb"^\s*CRYSTAL\b", re.IGNORECASE)
+block_end = re.compile(rb"^\s*END\b", re.IGNORECASE)
+block_name = re.compile(rb"^\s*NAME\s+(\S+)", re.IGNORECASE)
+
+def index_file(cgd_file):
+    return cgd_file + ".idx"
+
+def file_stamp(cgd_file):
+    st = os.stat(cgd_file)
+    return {"size": st.st_size, "mtime": st.st_mtime_ns}
+
+def build_index(cgd_file=CGD_FILE):
+    """Scan the .cgd file once and map each NAME to the byte offset and length of its CRYSTAL ... END block"""
+    blocks = {}
+    offset = 0
+    start = None
+    name = None
+    with open(cgd_file, "rb") as f:
+        for line in f:
+            if block_start.match(line):
+                start = offset
+                name = None
+            elif start is not None:
+                m = block_name.match(line)
+                if m and name is None:
+                    name = m.group(1).decode()
+                elif block_end.match(line):
+                    if name is not None and name not in blocks:
+                        blocks[name] = [start, offset + len(line) - start]
+                    start = None
+            offset += len(line)
+    index = {"source": os.path.basename(cgd_file), "stamp": file_stamp(cgd_file), "blocks": blocks}
+    with open(index_file(cgd_file), "w") as f:
+        json.dump(index, f)
+    return index
+
+def load_index(cgd_file=CGD_FILE):
+    """Return the index of the .cgd file, rebuilding it if the file changed since the index was written"""
+    try:
+        with open(index_file(cgd_file)) as f:
+            index = json.load(f)
+        if index.get("stamp") == file_stamp(cgd_file):
+            return index
+    except (OSError, ValueError):
+        pass
+    return build_index(cgd_file)
+
+class CgdReader:
+    """Memory-mapped access to single CRYSTAL blocks of a .cgd file"""
+
+    def __init__(self, cgd_file=CGD_FILE):
+        self.cgd_file = cgd_file
+        self.index = load_index(cgd_file)
+        self.blocks = self.index["blocks"]
+        self.lower = {name.lower(): name for name in self.blocks}
+        self.file = open(cgd_file, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def names(self):
+        return list(self.blocks)
+
+    def resolve(self, name):
+        if name in self.blocks:
+            return name
+        return self.lower.get(name.lower())
+
+    def size(self, name):
+        name = self.resolve(name)
+        return None if name is None else self.blocks[name][1]
+
+    def block(self, name):
+        name = self.resolve(name)
+        if name is None:
+            return None
+        offset, length = self.blocks[name]
+        return self.map[offset:offset + length].decode()
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python CgdIndex.py [--names | --rebuild | <network_name>...]")
+        sys.exit(1)
+    if sys.argv[1] == "--rebuild":
+        index = build_index()
+        print(f"{len(index['blocks'])} blocks indexed")
+        return
+    with CgdReader() as reader:
+        if sys.argv[1] == "--names":
+            for name in reader.names():
+                print(name)
+            return
+        missing = False
+        for name in sys.argv[1:]:
+            block = reader.block(name)
+            if block is None:
+                print(f"Network {name} not found in {reader.cgd_file}", file=sys.stderr)
+                missing = True
+            else:
+                sys.stdout.write(block)
+        if missing:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,279 +1,237 @@
+import os
 import sys
 import numpy as np
+from Triangulate import load_mesh, triangulation_mode
+from ExportSTL import STL_DTYPE
 eps = 1e-3
 
+def is_binary_stl(filename):
+    """A binary STL is exactly as long as its triangle count says"""
+    size = os.path.getsize(filename)
+    if size < 84:
+        return False
+    with open(filename, "rb") as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    return size == 84 + STL_DTYPE.itemsize * count
+
 def read_stl(filename):
-    triangles, verts = [], []
-    for line in open(filename):
-        if line.strip().startswith('vertex'):
-            verts.append([float(x) for x in line.strip().split()[1:]])
-            if len(verts) == 3:
-                triangles.append(np.array(verts))
-                verts = []
-    return triangles
+    """Triangles of an ASCII or binary STL file as one contiguous (M,3,3) array"""
+    if is_binary_stl(filename):
+        count = (os.path.getsize(filename) - 84) // STL_DTYPE.itemsize
+        if count == 0:
+            return np.zeros((0, 3, 3))
+        records = np.memmap(filename, dtype=STL_DTYPE, mode="r", offset=84, shape=(count,))
+        return np.ascontiguousarray(records["vertices"], dtype=float)
+    with open(filename, "rb") as f:
+        tokens = np.array(f.read().split())
+    start = np.flatnonzero(tokens == b"vertex")
+    return tokens[start[:, None] + np.arange(1, 4)].astype(float).reshape(-1, 3, 3)
 
-def tri_tri_intersect(tri1, tri2):
-    """
-    Check if two triangles have intersecting interiors (excluding shared edges/vertices).
-    Returns True if triangles intersect in their interiors, False otherwise.
-    """
-    def bounding_boxes_intersect(t1, t2):
-        """Quick bounding box intersection test"""
-        # Get min/max for each triangle
-        min1 = np.min(t1, axis=0)
-        max1 = np.max(t1, axis=0)
-        min2 = np.min(t2, axis=0)
-        max2 = np.max(t2, axis=0)
-        
-        # Check if bounding boxes overlap in all 3 dimensions
-        return (max1[0] >= min2[0] and min1[0] <= max2[0] and
-                max1[1] >= min2[1] and min1[1] <= max2[1] and
-                max1[2] >= min2[2] and min1[2] <= max2[2])
-    
-    # Quick bounding box test - early exit if no overlap
-    if not bounding_boxes_intersect(tri1, tri2):
-        return False
-    
-    def triangles_share_vertex(t1, t2):
-        """Check if triangles share any vertices"""
-        for v1 in t1:
-            for v2 in t2:
-                if np.linalg.norm(v1 - v2) < eps:
-                    return True
-        return False
-    
-    def triangles_share_edge(t1, t2):
-        """Check if triangles share an edge"""
-        edges1 = [(t1[i], t1[(i+1)%3]) for i in range(3)]
-        edges2 = [(t2[i], t2[(i+1)%3]) for i in range(3)]
-        
-        for e1 in edges1:
-            for e2 in edges2:
-                # Check if edges are the same (in either direction)
-                if ((np.linalg.norm(e1[0] - e2[0]) < eps and np.linalg.norm(e1[1] - e2[1]) < eps) or
-                    (np.linalg.norm(e1[0] - e2[1]) < eps and np.linalg.norm(e1[1] - e2[0]) < eps)):
-                    return True
-        return False
-    
-    def sign(p1, p2, p3):
-        return (p1[0] - p3[0]) * (p2[1] - p3[1]) - (p2[0] - p3[0]) * (p1[1] - p3[1])
-    
-    def point_in_triangle_2d(pt, v0, v1, v2):
-        d1 = sign(pt, v0, v1)
-        d2 = sign(pt, v1, v2)
-        d3 = sign(pt, v2, v0)
-        
-        has_neg = (d1 < 0) or (d2 < 0) or (d3 < 0)
-        has_pos = (d1 > 0) or (d2 > 0) or (d3 > 0)
-        
-        return not (has_neg and has_pos)
-    
-    def point_in_triangle_interior_2d(pt, v0, v1, v2):
-        """Check if point is strictly inside triangle (not on boundary)"""
-        d1 = sign(pt, v0, v1)
-        d2 = sign(pt, v1, v2)
-        d3 = sign(pt, v2, v0)
-        
-        # All signs must be same and non-zero for strict interior
-        return (d1 > eps and d2 > eps and d3 > eps) or (d1 < -eps and d2 < -eps and d3 < -eps)
-    
-    def get_plane_equation(triangle):
-        v0, v1, v2 = triangle
-        edge1 = v1 - v0
-        edge2 = v2 - v0
-        normal = np.cross(edge1, edge2)
-        if np.linalg.norm(normal) < eps:
-            return None
-        normal = normal / np.linalg.norm(normal)
-        d = -np.dot(normal, v0)
-        return normal, d
-    
-    def line_plane_intersect(line_start, line_dir, plane_normal, plane_d):
-        denom = np.dot(plane_normal, line_dir)
-        if abs(denom) < eps:
-            return None  # Line parallel to plane
-        t = -(np.dot(plane_normal, line_start) + plane_d) / denom
-        return line_start + t * line_dir, t
-    
-    def point_in_triangle_interior_3d(point, triangle):
-        """Check if point is strictly inside triangle interior"""
-        v0, v1, v2 = triangle
-        # Project to 2D by finding the dominant axis of the normal
-        edge1 = v1 - v0
-        edge2 = v2 - v0
-        normal = np.cross(edge1, edge2)
-        abs_normal = np.abs(normal)
-        
-        # Choose projection plane based on largest normal component
-        if abs_normal[0] >= abs_normal[1] and abs_normal[0] >= abs_normal[2]:
-            # Project to yz plane
-            pt_2d = point[[1, 2]]
-            v0_2d = v0[[1, 2]]
-            v1_2d = v1[[1, 2]]
-            v2_2d = v2[[1, 2]]
-        elif abs_normal[1] >= abs_normal[2]:
-            # Project to xz plane
-            pt_2d = point[[0, 2]]
-            v0_2d = v0[[0, 2]]
-            v1_2d = v1[[0, 2]]
-            v2_2d = v2[[0, 2]]
-        else:
-            # Project to xy plane
-            pt_2d = point[[0, 1]]
-            v0_2d = v0[[0, 1]]
-            v1_2d = v1[[0, 1]]
-            v2_2d = v2[[0, 1]]
-        
-        return point_in_triangle_interior_2d(pt_2d, v0_2d, v1_2d, v2_2d)
-    
-    def coplanar_triangles_overlap(t1, t2, normal):
-        """Check if two coplanar triangles overlap (excluding identical triangles)"""
-        # First check if triangles are identical
-        vertices_match = 0
-        for v1 in t1:
-            for v2 in t2:
-                if np.linalg.norm(v1 - v2) < eps:
-                    vertices_match += 1
-                    break
-        if vertices_match == 3:
-            return False  # Identical triangles, not intersecting
-        
-        # Project both triangles to 2D for overlap test
-        abs_normal = np.abs(normal)
-        if abs_normal[0] >= abs_normal[1] and abs_normal[0] >= abs_normal[2]:
-            # Project to yz plane
-            t1_2d = t1[:, [1, 2]]
-            t2_2d = t2[:, [1, 2]]
-        elif abs_normal[1] >= abs_normal[2]:
-            # Project to xz plane
-            t1_2d = t1[:, [0, 2]]
-            t2_2d = t2[:, [0, 2]]
-        else:
-            # Project to xy plane
-            t1_2d = t1[:, [0, 1]]
-            t2_2d = t2[:, [0, 1]]
-        
-        # Check if any vertex of t1 is inside t2 or vice versa
-        for vertex in t1_2d:
-            if point_in_triangle_interior_2d(vertex, t2_2d[0], t2_2d[1], t2_2d[2]):
-                return True
-        
-        for vertex in t2_2d:
-            if point_in_triangle_interior_2d(vertex, t1_2d[0], t1_2d[1], t1_2d[2]):
-                return True
-        
-        # Check edge-edge intersections in 2D
-        def line_segments_intersect_2d(p1, q1, p2, q2):
-            """Check if two 2D line segments intersect"""
-            def on_segment(p, q, r):
-                return (q[0] <= max(p[0], r[0]) and q[0] >= min(p[0], r[0]) and
-                        q[1] <= max(p[1], r[1]) and q[1] >= min(p[1], r[1]))
-            
-            def orientation(p, q, r):
-                val = (q[1] - p[1]) * (r[0] - q[0]) - (q[0] - p[0]) * (r[1] - q[1])
-                if abs(val) < eps:
-                    return 0  # collinear
-                return 1 if val > 0 else 2  # clockwise or counterclockwise
-            
-            o1 = orientation(p1, q1, p2)
-            o2 = orientation(p1, q1, q2)
-            o3 = orientation(p2, q2, p1)
-            o4 = orientation(p2, q2, q1)
-            
-            # General case
-            if o1 != o2 and o3 != o4:
-                return True
-            
-            # Special cases for collinear points
-            if (o1 == 0 and on_segment(p1, p2, q1)) or \
-               (o2 == 0 and on_segment(p1, q2, q1)) or \
-               (o3 == 0 and on_segment(p2, p1, q2)) or \
-               (o4 == 0 and on_segment(p2, q1, q2)):
-                return True
-            
-            return False
-        
-        # Check all edge pairs for intersection
-        for i in range(3):
-            edge1 = (t1_2d[i], t1_2d[(i+1)%3])
-            for j in range(3):
-                edge2 = (t2_2d[j], t2_2d[(j+1)%3])
-                if line_segments_intersect_2d(edge1[0], edge1[1], edge2[0], edge2[1]):
-                    return True
-        
-        return False
-    
-    # Early exit: if triangles share vertices or edges, they don't have intersecting interiors
-    if triangles_share_vertex(tri1, tri2) or triangles_share_edge(tri1, tri2):
-        return False
-    
-    # Get plane equations for both triangles
-    plane1 = get_plane_equation(tri1)
-    plane2 = get_plane_equation(tri2)
-    
-    if plane1 is None or plane2 is None:
-        return False  # Degenerate triangle
-    
-    normal1, d1 = plane1
-    normal2, d2 = plane2
-    
-    # Check if triangles are coplanar
-    if abs(np.dot(normal1, normal2)) > 1 - eps:
-        # Check if they're actually on the same plane
-        dist_to_plane2 = abs(np.dot(normal2, tri1[0]) + d2)
-        if dist_to_plane2 < eps:
-            # Coplanar - check for overlap
-            return coplanar_triangles_overlap(tri1, tri2, normal1)
-        else:
-            return False  # Parallel but different planes
-    
-    # Check each edge of tri1 against tri2's plane for interior intersections
-    for i in range(3):
-        v1 = tri1[i]
-        v2 = tri1[(i + 1) % 3]
-        edge_dir = v2 - v1
-        
-        # Find intersection with tri2's plane
-        intersection = line_plane_intersect(v1, edge_dir, normal2, d2)
-        if intersection is not None:
-            point, t = intersection
-            # Check if intersection point is strictly inside the edge (not at endpoints)
-            if eps < t < 1 - eps:
-                # Check if intersection point is in tri2's interior
-                if point_in_triangle_interior_3d(point, tri2):
-                    return True
-    
-    # Check each edge of tri2 against tri1's plane for interior intersections
-    for i in range(3):
-        v1 = tri2[i]
-        v2 = tri2[(i + 1) % 3]
-        edge_dir = v2 - v1
-        
-        # Find intersection with tri1's plane
-        intersection = line_plane_intersect(v1, edge_dir, normal1, d1)
-        if intersection is not None:
-            point, t = intersection
-            # Check if intersection point is strictly inside the edge (not at endpoints)
-            if eps < t < 1 - eps:
-                # Check if intersection point is in tri1's interior
-                if point_in_triangle_interior_3d(point, tri1):
-                    return True
-    
-    return False
+def read_triangles(filename, mode="fan"):
+    """Triangles of an STL file, or of the mesh of a surface_data.json file"""
+    if filename.endswith(".json"):
+        return load_mesh(filename, mode).triangle_vertices()
+    return read_stl(filename)
+
+def triangle_boxes(triangles):
+    """Axis-aligned bounding boxes of all triangles, as (M,3) arrays of lower and upper corners"""
+    return triangles.min(axis=1), triangles.max(axis=1)
+
+def group_pairs(keys, items):
+    """Pairs of items with equal keys, (P,2)"""
+    order = np.argsort(keys, kind="stable")
+    keys, items = keys[order], items[order]
+    # pair every entry with the entries after it in the same group
+    ends = np.searchsorted(keys, keys, side="right")
+    later = ends - np.arange(len(keys)) - 1
+    a = np.repeat(np.arange(len(keys)), later)
+    b = a + 1 + np.arange(later.sum()) - np.repeat(np.cumsum(later) - later, later)
+    return np.stack([items[a], items[b]], axis=1)
+
+def sorted_pair_keys(pairs, n):
+    """Keys i * n + j of the distinct pairs with i < j, in increasing order"""
+    pairs = np.sort(pairs, axis=1)
+    pairs = pairs[pairs[:, 0] < pairs[:, 1]]
+    return np.unique(pairs[:, 0] * n + pairs[:, 1])
+
+def grid_pairs(lo, hi, size):
+    """Pairs of boxes registered in a common cell of a uniform grid of the given cell size, (P,2) with i < j.
+    Boxes whose closed extents overlap always share the cell of a common point, so none is missed."""
+    origin = lo.min(axis=0)
+    first = np.floor((lo - origin) / size).astype(np.int64)
+    span = np.floor((hi - origin) / size).astype(np.int64) - first + 1
+    counts = np.prod(span, axis=1)
+    box = np.repeat(np.arange(len(lo)), counts)
+    # k-th cell of the block of every box, in x, y, z order
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    sy, sz = span[box, 1], span[box, 2]
+    cells = first[box] + np.stack([k // (sy * sz), k // sz % sy, k % sz], axis=1)
+    dims = cells.max(axis=0, initial=0) + 1
+    return group_pairs((cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2], box)
+
+def weld_vertices(triangles, tol=eps):
+    """Integer vertex IDs of the triangle corners, (M,3).  Corners closer than tol get the same ID, and so do
+    chains of such corners.  Close corners are found by hashing boxes of size tol into a grid of cell size tol."""
+    points, inverse = np.unique(triangles.reshape(-1, 3), axis=0, return_inverse=True)
+    labels = np.arange(len(points))
+    if len(points) > 1:
+        pairs = grid_pairs(points - tol / 2, points + tol / 2, tol)
+        offsets = points[pairs[:, 0]] - points[pairs[:, 1]]
+        pairs = pairs[np.sqrt(dot3(offsets, offsets)) < tol]
+        # every point takes the smallest label of its cluster
+        while True:
+            low = np.minimum(labels[pairs[:, 0]], labels[pairs[:, 1]])
+            updated = labels.copy()
+            np.minimum.at(updated, pairs[:, 0], low)
+            np.minimum.at(updated, pairs[:, 1], low)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+    _, ids = np.unique(labels, return_inverse=True)
+    return ids.reshape(-1)[inverse.reshape(-1)].reshape(-1, 3)
+
+def adjacent_pairs(ids):
+    """Keys (see sorted_pair_keys) of the triangle pairs sharing a vertex ID, from the vertex-triangle incidence"""
+    n = len(ids)
+    return sorted_pair_keys(group_pairs(ids.reshape(-1), np.repeat(np.arange(n), 3)), n)
+
+def candidate_pairs(triangles, stats=None):
+    """Pairs (i, j), i < j, of triangles with overlapping bounding boxes (bounds inclusive), in lexicographic
+    order.  The pairs come from a uniform grid with cells as large as the
+    mean triangle extent."""
+    n = len(triangles)
+    lo, hi = triangle_boxes(triangles)
+    size = np.mean(np.max(hi - lo, axis=1)) if n else 0
+    if n < 2 or not size > 0:
+        pairs = np.array(np.triu_indices(n, 1)).T
+    else:
+        pairs = sorted_pair_keys(grid_pairs(lo, hi, size), n)
+        pairs = np.stack([pairs // n, pairs % n], axis=1)
+    grid = len(pairs)
+    i, j = pairs[:, 0], pairs[:, 1]
+    pairs = pairs[np.all((hi[i] >= lo[j]) & (lo[i] <= hi[j]), axis=1)]
+    if stats is not None:
+        stats.update({"triangles": n, "pairs": n * (n - 1) // 2, "grid": grid, "candidates": len(pairs)})
+    return pairs
+
+def dot3(a, b):
+    return a[..., 0] * b[..., 0] + a[..., 1] * b[..., 1] + a[..., 2] * b[..., 2]
+
+def orient_2d(p1, p2, p3):
+    return (p1[..., 0] - p3[..., 0]) * (p2[..., 1] - p3[..., 1]) - (p2[..., 0] - p3[..., 0]) * (p1[..., 1] - p3[..., 1])
+
+def interior_2d(points, triangles):
+    """Whether the points (P,K,2) are strictly inside the triangles (P,3,2) of their row"""
+    v0, v1, v2 = triangles[:, None, 0], triangles[:, None, 1], triangles[:, None, 2]
+    d1, d2, d3 = orient_2d(points, v0, v1), orient_2d(points, v1, v2), orient_2d(points, v2, v0)
+    return ((d1 > eps) & (d2 > eps) & (d3 > eps)) | ((d1 < -eps) & (d2 < -eps) & (d3 < -eps))
+
+def project_2d(points, normals):
+    """Drop the coordinate of the largest component of each normal (the first one on ties)"""
+    a = np.abs(normals)
+    x = (a[:, 0] >= a[:, 1]) & (a[:, 0] >= a[:, 2])
+    y = ~x & (a[:, 1] >= a[:, 2])
+    axes = np.where(x[:, None], [1, 2], np.where(y[:, None], [0, 2], [0, 1]))
+    return np.take_along_axis(points, axes[:, None, :], axis=-1)
+
+def edge_hits(tri1, unit2, d2, tri2, normal2):
+    """Whether an edge of tri1 crosses the plane of tri2 strictly inside the edge and inside tri2"""
+    direction = np.roll(tri1, -1, axis=1) - tri1
+    denom = dot3(unit2[:, None], direction)
+    t = -(dot3(unit2[:, None], tri1) + d2[:, None]) / denom
+    points = tri1 + t[..., None] * direction
+    inside = interior_2d(project_2d(points, normal2), project_2d(tri2, normal2))
+    return np.any((np.abs(denom) >= eps) & (eps < t) & (t < 1 - eps) & inside, axis=1)
+
+def orientation_2d(p, q, r):
+    val = (q[..., 1] - p[..., 1]) * (r[..., 0] - q[..., 0]) - (q[..., 0] - p[..., 0]) * (r[..., 1] - q[..., 1])
+    return np.where(np.abs(val) < eps, 0, np.where(val > 0, 1, 2))
+
+def on_segment(p, q, r):
+    return ((q[..., 0] <= np.maximum(p[..., 0], r[..., 0])) & (q[..., 0] >= np.minimum(p[..., 0], r[..., 0])) &
+            (q[..., 1] <= np.maximum(p[..., 1], r[..., 1])) & (q[..., 1] >= np.minimum(p[..., 1], r[..., 1])))
+
+def coplanar_overlap(tri1, tri2, unit1):
+    """Whether coplanar triangles overlap: a vertex strictly inside the other triangle, or crossing edges"""
+    a, b = project_2d(tri1, unit1), project_2d(tri2, unit1)
+    hit = np.any(interior_2d(a, b), axis=1) | np.any(interior_2d(b, a), axis=1)
+    # all 9 edge pairs, edges of tri1 along axis 1 and of tri2 along axis 2
+    p1, q1 = a[:, :, None], np.roll(a, -1, axis=1)[:, :, None]
+    p2, q2 = b[:, None], np.roll(b, -1, axis=1)[:, None]
+    o1, o2 = orientation_2d(p1, q1, p2), orientation_2d(p1, q1, q2)
+    o3, o4 = orientation_2d(p2, q2, p1), orientation_2d(p2, q2, q1)
+    crossing = ((o1 != o2) & (o3 != o4)) | ((o1 == 0) & on_segment(p1, p2, q1)) | \
+        ((o2 == 0) & on_segment(p1, q2, q1)) | ((o3 == 0) & on_segment(p2, p1, q2)) | \
+        ((o4 == 0) & on_segment(p2, q1, q2))
+    return hit | np.any(crossing, axis=(1, 2))
+
+def tri_tri_intersect_batch(pairs, adjacent=None):
+    """Whether the triangles of each pair (P,2,3,3) have intersecting interiors.
+    Pairs with disjoint bounding boxes, adjacent pairs and degenerate triangles (area below eps) never
+    intersect.  Adjacent pairs are those marked in adjacent (precomputed from welded vertex IDs), or without
+    it those with two corners closer than eps.  Coplanar triangles (normals within eps, plane distance below
+    eps) intersect if a vertex lies strictly inside the other triangle or two edges cross; others if an edge
+    of one crosses the plane of the other strictly between its ends (t in (eps, 1 - eps)) at a point strictly
+    inside the other.  Every branch is evaluated as masked array operations on the pairs that reach it."""
+    tri1, tri2 = pairs[:, 0], pairs[:, 1]
+    result = np.zeros(len(pairs), dtype=bool)
+    overlap = np.all((tri1.max(axis=1) >= tri2.min(axis=1)) & (tri1.min(axis=1) <= tri2.max(axis=1)), axis=1)
+    if adjacent is None:
+        # sharing an edge implies sharing a vertex
+        offsets = tri1[:, :, None] - tri2[:, None, :]
+        share = np.any(np.sqrt(dot3(offsets, offsets)) < eps, axis=(1, 2))
+    else:
+        share = adjacent
+    normal1 = np.cross(tri1[:, 1] - tri1[:, 0], tri1[:, 2] - tri1[:, 0])
+    normal2 = np.cross(tri2[:, 1] - tri2[:, 0], tri2[:, 2] - tri2[:, 0])
+    length1, length2 = np.sqrt(dot3(normal1, normal1)), np.sqrt(dot3(normal2, normal2))
+    active = np.flatnonzero(overlap & ~share & (length1 >= eps) & (length2 >= eps))
+    tri1, tri2, normal1, normal2 = tri1[active], tri2[active], normal1[active], normal2[active]
+    unit1, unit2 = normal1 / length1[active, None], normal2 / length2[active, None]
+    d1, d2 = -dot3(unit1, tri1[:, 0]), -dot3(unit2, tri2[:, 0])
+
+    coplanar = np.abs(dot3(unit1, unit2)) > 1 - eps
+    same = coplanar & (np.abs(dot3(unit2, tri1[:, 0]) + d2) < eps)
+    if same.any():
+        result[active[same]] = coplanar_overlap(tri1[same], tri2[same], unit1[same])
+    crossing = ~coplanar
+    if crossing.any():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hits = edge_hits(tri1[crossing], unit2[crossing], d2[crossing], tri2[crossing], normal2[crossing]) | \
+                edge_hits(tri2[crossing], unit1[crossing], d1[crossing], tri1[crossing], normal1[crossing])
+        result[active[crossing]] = hits
+    return result
+
+def first_intersection(triangles, pairs, adjacent=None, chunk=100000):
+    """First of the pairs whose triangles intersect, or None"""
+    for start in range(0, len(pairs), chunk):
+        block = pairs[start:start + chunk]
+        hits = np.flatnonzero(tri_tri_intersect_batch(triangles[block],
+                                                      None if adjacent is None else adjacent[start:start + chunk]))
+        if len(hits):
+            return block[hits[0]]
+    return None
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python CheckEmbed.py file.stl")
+        print("Usage: python CheckEmbed.py <file.stl | surface_data.json> [--triangulation fan|ear]")
         sys.exit(1)
-    triangles = read_stl(sys.argv[1])
-    n = len(triangles)
-    for i in range(n):
-        for j in range(i+1, n):
-            if tri_tri_intersect(triangles[i], triangles[j]):
-                print("false")
-                print("Triangle 1:", triangles[i])
-                print("Triangle 2:", triangles[j])
-                return
+    triangles = read_triangles(sys.argv[1], triangulation_mode(sys.argv))
+    stats = {}
+    pairs = candidate_pairs(triangles, stats)
+    ids = weld_vertices(triangles)
+    adjacent = np.isin(pairs[:, 0] * len(triangles) + pairs[:, 1], adjacent_pairs(ids))
+    stats.update({"vertices": int(ids.max(initial=-1)) + 1, "adjacent": int(adjacent.sum())})
+    print(" ".join(f"{k}={v}" for k, v in stats.items()), file=sys.stderr)
+    pair = first_intersection(triangles, pairs, adjacent)
+    if pair is not None:
+        i, j = pair
+        print("false")
+        print("Triangle 1:", triangles[i])
+        print("Triangle 2:", triangles[j])
+        return
     print("true")
 
 if __name__ == "__main__":
@@ -1,34 +1,25 @@
 import json
 import numpy as np
+from PeriodicGraph import PeriodicGraph
 
-with open("network_data.json") as f:
-    data = json.load(f)
-    periods = data["periods"]
-    vertices = data["vertices"]
-    halfedges = data["halfedges"]
+def coplanar_margins(graph):
+    """Smallest singular value of every vertex star (0 for stars of at most 3 edges, which are always accepted)"""
+    singular_values, _ = graph.star_svd()
+    return np.where(graph.degrees() > 3, singular_values[:, -1], 0.0)
 
+def is_coplanar(graph, tol=1e-3, verbose=False):
+    failing = np.nonzero(coplanar_margins(graph) > tol)[0]
+    if len(failing) and verbose:
+        v = failing[0]
+        print(v, graph.vectors[graph.star(v)], graph.star_svd()[0][v])
+    return len(failing) == 0
 
-adj = [[] for _ in range(len(vertices))]
-for h in halfedges:
-    adj[h[0]].append((h[1], h[-1]))
+def main():
+    with open("network_data.json") as f:
+        data = json.load(f)
+    graph = PeriodicGraph.from_data(data)
+    coplanar = is_coplanar(graph, tol=1e-3, verbose=True)  # tolerance for numerical errors
+    print("true" if coplanar else "false")
 
-coplanar = True
-tol = 1e-3  # tolerance for numerical errors
-for v in range(len(vertices)):
-    neighbors = []
-    v1 = vertices[v]
-    for u, cell in adj[v]:
-        v2 = np.array(vertices[u]) + np.dot(cell, periods)
-        edge_vector = np.array(v2) - np.array(v1)
-        neighbors.append(edge_vector)
-    neighbors = np.array(neighbors)
-    if len(neighbors) <= 3:
-        continue
-    else:
-        _, s, _ = np.linalg.svd(neighbors)
-        if s[-1] > tol:
-            coplanar = False
-            print(v, neighbors, s)
-            break
-
-print("true" if coplanar else "false")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
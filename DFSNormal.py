@@ -1,62 +1,97 @@
 import json
-from unittest import result
 import numpy as np
-import sys
+from collections import deque
+from PeriodicGraph import PeriodicGraph
+from Orthogonal import normal_dots
 
-sys.setrecursionlimit(10000)
-
-with open("network_data.json") as f:
-    data = json.load(f)
-    periods = data["periods"]
-    vertices = data["vertices"]
-    halfedges = data["halfedges"]
-
-adj = [[] for _ in range(len(vertices))]
-for h in halfedges:
-    adj[h[0]].append((h[1], h[-1]))
-
-normals = []
-for v in range(len(vertices)):
-    neighbors = []
-    v1 = vertices[v]
-    for u, cell in adj[v]:
-        v2 = np.array(vertices[u]) + np.dot(cell, periods)
-        edge_vector = np.array(v2) - np.array(v1)
-        neighbors.append(edge_vector)
-    neighbors = np.array(neighbors)
+def conflict_cycle(graph, parity, start):
+    """Shortest closed walk through start whose halfedges flip the orientation an odd number of times,
+    found by BFS in the double cover (vertex, parity), then cut down to a simple cycle"""
+    offsets, order, target = graph.offsets.tolist(), graph.order.tolist(), graph.target.tolist()
+    previous = {(start, 0): None}
+    queue = deque([(start, 0)])
+    while queue:
+        v, p = queue.popleft()
+        if (v, p) == (start, 1):
+            break
+        for h in order[offsets[v]:offsets[v + 1]]:
+            state = (target[h], p ^ parity[h])
+            if state not in previous:
+                previous[state] = ((v, p), h)
+                queue.append(state)
+    walk = []
+    state = (start, 1)
+    while previous[state] is not None:
+        state, h = previous[state]
+        walk.append(h)
+    walk.reverse()
+    # a closed walk passing a vertex twice splits into two shorter closed walks, one of them odd
+    while True:
+        origins = graph.origin[walk].tolist()
+        seen = {}
+        for i, v in enumerate(origins):
+            if v in seen:
+                break
+            seen[v] = i
+        else:
+            return walk
+        inner = walk[seen[v]:i]
+        if sum(parity[h] for h in inner) % 2:
+            walk = inner
+        else:
+            walk = walk[:seen[v]] + walk[i:]
 
-    _, _, vh = np.linalg.svd(neighbors)
-    normal = vh[-1]
-    normal = normal / np.linalg.norm(normal)
-    normals.append(normal)
+def orient_normals(graph):
+    """Choose the sign of every normal so that normals at adjacent vertices form acute angles.
+    The signs are a parity constraint system over the halfedges, solved by BFS 2-colouring of every
+    connected component.  Returns (normals, None), or (None, cycle) with a conflicting cycle of halfedges."""
+    _, normals = graph.star_svd()
+    dots = normal_dots(graph)
+    orthogonal = np.nonzero(dots == 0)[0]
+    if len(orthogonal):
+        # no choice of signs makes an angle of exactly 90 degrees acute
+        return None, [int(orthogonal[0])]
+    parity = (dots < 0).astype(int).tolist()
+    offsets, order, target = graph.offsets.tolist(), graph.order.tolist(), graph.target.tolist()
 
-visited = [False] * len(vertices)
+    sign = [0] * graph.num_vertices
+    for root in range(graph.num_vertices):
+        if sign[root]:
+            continue
+        sign[root] = 1
+        queue = deque([root])
+        while queue:
+            v = queue.popleft()
+            for h in order[offsets[v]:offsets[v + 1]]:
+                u = target[h]
+                required = -sign[v] if parity[h] else sign[v]
+                if not sign[u]:
+                    sign[u] = required
+                    queue.append(u)
+                elif sign[u] != required:
+                    return None, conflict_cycle(graph, parity, v)
+    return normals * np.array(sign)[:, None], None
 
-def dfs(v):
-    visited[v] = True
-    v_normal = normals[v]
-    success = True
-    for u, _ in adj[v]:
-        u_normal = normals[u]
-        dot = np.dot(v_normal, u_normal)
-        if dot <= 0:
-            if visited[u]:
-                success = False
-                break
-            else:
-                normals[u] = -u_normal
-        if not visited[u]:
-            success = success and dfs(u)
-    return success
+def assign_normals(graph):
+    """Oriented normal vectors, or None if no orientation makes all adjacent normals form acute angles"""
+    normals, _ = orient_normals(graph)
+    return None if normals is None else list(normals)
 
-success = dfs(0)
+def main():
+    with open("network_data.json") as f:
+        data = json.load(f)
+    graph = PeriodicGraph.from_data(data)
+    normals, cycle = orient_normals(graph)
 
-if success:
-    print("true")
-    # Save new normals to network_data.json
-    data["normals"] = [normal.tolist() for normal in normals]
-    with open("network_data.json", "w") as f:
-        json.dump(data, f)
-else:
-    print("false")
+    if normals is not None:
+        print("true")
+        # Save new normals to network_data.json
+        data["normals"] = normals.tolist()
+        with open("network_data.json", "w") as f:
+            json.dump(data, f)
+    else:
+        print("Conflicting cycle:", [graph.halfedges()[h] for h in cycle])
+        print("false")
 
+if __name__ == "__main__":
+    main()
@@ -1,125 +1,41 @@
-import json
 import numpy as np
 import sys
+from Triangulate import load_mesh, triangulation_mode
 
-if len(sys.argv) < 2:
-    print("Usage: python ExportSTL.py <network_name>")
-    sys.exit(1)
+STL_DTYPE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
 
-network_name = sys.argv[1]
-modelfile = f"models/{network_name}.stl"
+def triangle_normals(triangles):
+    """Unit normals of all triangles (zero for degenerate ones), (M,3)"""
+    triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    return np.divide(normals, lengths[:, None], out=np.zeros_like(normals), where=lengths[:, None] > 0)
 
-with open("surface_data.json") as f:
-    data = json.load(f)
-    periods = data["periods"]
-    vertices = data["vertices"]
-    halfedges = data["halfedges"]
-    faces = data["faces"]
+def stl_records(triangles, attributes=0):
+    """Binary STL records (normal, vertices, attribute) of all triangles, (M,) of STL_DTYPE"""
+    triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+    records = np.empty(len(triangles), dtype=STL_DTYPE)
+    records["normal"] = triangle_normals(triangles)
+    records["vertices"] = triangles
+    records["attribute"] = attributes
+    return records
 
-def find_dup(verts, tol=1e-6):
-    n = len(verts)
-    for length in range(2, n//2+1):
-        for i in range(n):
-            sub = [verts[(i+k)%n] for k in range(length)]
-            for j in range(n):
-                if j == i:
-                    continue
-                match = True
-                for k in range(length):
-                    if not np.allclose(verts[(j+k)%n], sub[-(k+1)], atol=tol):
-                        match = False
-                        break
-                if match:
-                    i1 = i
-                    j1 = (i+length-1)%n
-                    i2 = j
-                    j2 = (j+length-1)%n
-                    return i1, j1, i2, j2
-    return None
+def write_stl_header(f, count):
+    """80-byte header and triangle count of a binary STL file opened for writing"""
+    f.write(b"binary STL surface_model".ljust(80, b" "))
+    np.array([count], dtype="<u4").tofile(f)
 
-triangles = []
+def write_binary_stl(triangles, filename, attributes=0):
+    """Binary STL: 80-byte header, triangle count, and one 50-byte record per triangle written in one go"""
+    records = stl_records(triangles, attributes)
+    with open(filename, "wb") as f:
+        write_stl_header(f, len(records))
+        records.tofile(f)
 
-def draw_polygon(vlist):
-    center = np.mean(vlist, axis=0)
-    n = len(vlist)
-    for i in range(n):
-        triangles.append([center, vlist[i], vlist[(i+1)%n]])
-
-def draw_band(face):
-    cell = [0, 0, 0]
-    verts = []
-    for h_idx in face:
-        h = halfedges[h_idx]
-        v_idx = h[0]
-        v = np.array(vertices[v_idx]) + np.dot(cell, periods)
-        verts.append(v)
-        cell = [c + d for c, d in zip(cell, h[2])]
-    verts_list = list(verts)
-    dir = np.dot(cell, periods)
-    dir = np.array(dir)
-    dir = dir / np.linalg.norm(dir)
-    # Project all verts_list onto the line through the center with direction dir
-    center = np.mean(verts_list, axis=0)
-    projected_verts = []
-    for i, v in enumerate(verts_list):
-        v = np.array(v)
-        t = np.dot(v - center, dir)
-        projected_verts.append(center + t * dir)
-    for i in range(len(verts_list)-1):
-        draw_polygon([verts_list[i], verts_list[i+1], projected_verts[i+1], projected_verts[i]])
-
-def draw_face(face):
-    cell = [0, 0, 0]
-    verts = []
-    for h_idx in face:
-        h = halfedges[h_idx]
-        v_idx = h[0]
-        v = np.array(vertices[v_idx]) + np.dot(cell, periods)
-        verts.append(v)
-        cell = [c + d for c, d in zip(cell, h[2])]
-    verts_list = list(verts)
-    while True:
-        dup = find_dup(verts_list)
-        if not dup:
-            break
-        i1, j1, i2, j2 = dup
-        n = len(verts_list)
-        # Rotate verts_list so that i1 == 1
-        shift = (i1 - 1) % n
-        verts_list = verts_list[shift:] + verts_list[:shift]
-        # Update indices after rotation
-        i1 = 1
-        j1 = (j1 - shift) % n
-        i2 = (i2 - shift) % n
-        j2 = (j2 - shift) % n
-        # Ensure i1 < j1 < i2 < j2
-        if i2 < j1:
-            i1, j1, i2, j2 = i2, j2, i1, j1
-        # Triangulate polygons for the two duplicate sublists
-        poly1 = [verts_list[(k)%len(verts_list)] for k in range(i1-1, j1+2)]
-        draw_polygon(poly1)
-        poly2 = [verts_list[(k)%len(verts_list)] for k in range(i2-1, j2+2)]
-        draw_polygon(poly2)
-        # Remove the duplicate sublists (second occurrence first)
-        for _ in range(i2, j2+1):
-            verts_list.pop(i2 % len(verts_list))
-        for _ in range(i1, j1+1):
-            verts_list.pop(i1 % len(verts_list))
-    # Triangulate polygon for remaining vertices
-    if len(verts_list) > 2:
-        draw_polygon(verts_list)
-
-for face in faces:
-    cell = [0, 0, 0]
-    for h_idx in face:
-        h = halfedges[h_idx]
-        cell = [c + d for c, d in zip(cell, h[2])]
-    if all(c == 0 for c in cell):
-        draw_face(face)
-    else:
-        draw_band(face)
-
-def write_stl(triangles, filename):
+def write_stl(triangles, filename, binary=False):
+    if binary:
+        write_binary_stl(triangles, filename)
+        return
     with open(filename, "w") as f:
         f.write("solid surface_model\n")
         for tri in triangles:
@@ -137,4 +53,16 @@ def write_stl(triangles, filename):
             f.write("  endfacet\n")
         f.write("endsolid surface_model\n")
 
-write_stl(triangles, modelfile)
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python ExportSTL.py <network_name> [--triangulation fan|ear] [--binary]")
+        sys.exit(1)
+
+    network_name = sys.argv[1]
+    modelfile = f"models/{network_name}.stl"
+
+    mesh = load_mesh("surface_data.json", triangulation_mode(sys.argv))
+    write_stl(mesh.triangle_vertices(), modelfile, "--binary" in sys.argv)
+
+if __name__ == "__main__":
+    main()
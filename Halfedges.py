@@ -1,124 +1,184 @@
 import sys
 import subprocess
-import math
 import numpy as np
+from scipy.spatial import cKDTree
 import json
+from SystreCache import SystreCache
 
-if len(sys.argv) < 2:
-    print("Usage: python RotationSystem3D.py <network_name>")
-    sys.exit(1)
-
-network_name = sys.argv[1]
-command = ["sh", "run_systre.sh", network_name]
-result = subprocess.run(command, capture_output=True, text=True)
-systre_output = result.stdout
-
-lines = [line.strip() for line in systre_output.splitlines()]
-keywords = ["Relaxed cell parameters:", "Barycentric positions:", "Edges:", "Edge centers:"]
-# keywords = ["Relaxed cell parameters:", "Relaxed positions:", "Edges:", "Edge centers:"]
-key_lines = [i for i, line in enumerate(lines) if any(keyword in line for keyword in keywords)]
-
-#extract systre symbol
-str_symbol = lines[2]
-split_symbol = str_symbol.split('"')
-symbol = split_symbol[1] if len(split_symbol) > 1 else None
-print("Symbol:", symbol)
-
-#extract dimension
-str_dim = lines[4]
-split_dim = str_dim.split()
-split_last = split_dim[-1].split("-")
-dimension = int(split_last[0])
-if dimension != 3:
-    raise SystemExit("Aborted: Dimension is not 3.")
-
-#extract basis
-str_basis = lines[key_lines[0]+1 : key_lines[0]+3]
-str_basis_split = [item for sublist in (s.split(",") for s in str_basis) for item in sublist]
-shape = [float(x.split()[-1]) for x in str_basis_split]
-shape[3:6] = [np.radians(angle) for angle in shape[3:6]]
-angleA = np.arccos((np.cos(shape[3]) - np.cos(shape[4]) * np.cos(shape[5])) /
-                   (np.sin(shape[4]) * np.sin(shape[5])))
-period3 = [
-    np.cos(shape[4]),
-    np.sin(shape[4]) * np.cos(angleA),
-    np.sin(shape[4]) * np.sin(angleA)
-]
-periods = np.array([
-    [shape[0], 0, 0],
-    [shape[1] * np.cos(shape[-1]), shape[1] * np.sin(shape[-1]), 0],
-    [shape[2] * period3[0], shape[2] * period3[1], shape[2] * period3[2]]
-])
-norms = [float(np.linalg.norm(period)) for period in periods]
-angle_12 = np.degrees(np.arccos(np.dot(periods[0], periods[1]) / (norms[0] * norms[1])))
-angle_23 = np.degrees(np.arccos(np.dot(periods[1], periods[2]) / (norms[1] * norms[2])))
-angle_31 = np.degrees(np.arccos(np.dot(periods[2], periods[0]) / (norms[2] * norms[0])))
-print("Norms:", norms)
-print("Angle between periods 1 and 2 (degrees):", angle_12)
-print("Angle between periods 2 and 3 (degrees):", angle_23)
-print("Angle between periods 3 and 1 (degrees):", angle_31)
-
-#extract positions
-str_vertices = lines[key_lines[1] + 1 : key_lines[2]]
-split_vertices = [line.split() for line in str_vertices]
-vertices = [list(map(float, vert[2:])) for vert in split_vertices]
-for v, vert in enumerate(vertices):
-    vertices[v] = [vv if vv < 1.0 else 0.0 for vv in vert]
-print("Vertices", vertices)
-
-# compute halfedges and inversions
-str_edges = lines[key_lines[2] + 1 : key_lines[3]]
-split_edges = [edge.split() for edge in str_edges]
-edges = [[list(map(float, edge[:3])), list(map(float, edge[4:7]))] for edge in split_edges]
-edges = [[tuple(edge_part) for edge_part in edge] for edge in edges]
-for edge in edges:
-    print(edge)
-halfedges = []
-inversions = []
-
-vertices = np.array(vertices)
-
-def find_vertex_index(target, vertices, tol=1e-3):
-    for i, v in enumerate(vertices):
-        if np.allclose(v, target, atol=tol):
-            return i
-    return None
-
-print(len(edges))
-
-for e, edge in enumerate(edges):
-    try:
-        cell1 = [math.floor(x) for x in edge[0]]
-        vertex1 = [x - c for x, c in zip(edge[0], cell1)]
-        v1 = find_vertex_index(vertex1, vertices)
-        cell2 = [math.floor(x) for x in edge[1]]
-        vertex2 = [x - c for x, c in zip(edge[1], cell2)]
-        v2 = find_vertex_index(vertex2, vertices)
-        cell = [c2 - c1 for c2, c1 in zip(cell2, cell1)]
-        nonzero = any(c != 0 for c in cell)
-        if v1 is None or v2 is None:
-            raise ValueError(f"Edge {edge}: vertex not found for {vertex1} or {vertex2}")
-        if v1 < v2 or (v1 == v2 and nonzero):
-            halfedges.append([v1, v2, cell])
-            halfedges.append([v2, v1, [-c for c in cell]])
-            inversions.extend([len(halfedges)-1, len(halfedges) - 2])
-    except Exception as ex:
-        print(ex)
-print("Halfedges:", halfedges)
-print("Inversions:", inversions)
-
-vertices = np.array(vertices)
-periods = np.array(periods)
-vertices = np.dot(vertices, periods)
-print("Transformed vertices:", vertices)
-
-output_data = {
-    "periods": periods.tolist(),
-    "vertices": vertices.tolist(),
-    "halfedges": halfedges,
-    "inversions": inversions,
-    "normals": []
-}
-
-with open("network_data.json", "w") as f:
-    json.dump(output_data, f, indent=2)
\ No newline at end of file
+SYSTRE_JAR = "Systre-19.6.0.jar"
+SYSTRE_MODES = {"barycentric": ["-fullUnitCell", "-barycentric"], "relaxed": ["-fullUnitCell"]}
+
+keywords = ["Relaxed cell parameters:", "positions:", "Edges:", "Edge centers:"]
+
+def run_systre(network_name, mode="barycentric", cache=None):
+    if cache is not None:
+        systre_output = cache.get(network_name, mode)
+        if systre_output is not None:
+            return systre_output
+    command = ["sh", "run_systre.sh", network_name, mode]
+    result = subprocess.run(command, capture_output=True, text=True)
+    systre_output = result.stdout
+    # a run cut off by a crash of the JVM would otherwise be returned from the cache for good
+    if cache is not None and result.returncode == 0:
+        cache.put(network_name, mode, systre_output)
+    return systre_output
+
+def parse_systre(lines):
+    """Parse the Systre output of a single structure into symbol, cell parameters, positions and edges"""
+    lines = [line.strip() for line in lines]
+    key_lines = [next((i for i, line in enumerate(lines) if keyword in line), None) for keyword in keywords]
+    if any(k is None for k in key_lines):
+        errors = [line for line in lines if line.startswith("!!!")]
+        raise ValueError(errors[0] if errors else "Incomplete Systre output.")
+
+    #extract systre symbol
+    str_symbol = next((line for line in lines if line.startswith("Structure #")), "")
+    split_symbol = str_symbol.split('"')
+    symbol = split_symbol[1] if len(split_symbol) > 1 else None
+
+    #extract dimension
+    str_dim = next((line for line in lines if "described as" in line), "")
+    split_dim = str_dim.split()
+    split_last = split_dim[-1].split("-") if split_dim else [""]
+    dimension = int(split_last[0]) if split_last[0].isdigit() else None
+
+    #extract basis
+    str_basis = lines[key_lines[0]+1 : key_lines[0]+3]
+    str_basis_split = [item for sublist in (s.split(",") for s in str_basis) for item in sublist]
+    shape = [float(x.split()[-1]) for x in str_basis_split]
+
+    #extract positions
+    str_vertices = lines[key_lines[1] + 1 : key_lines[2]]
+    split_vertices = [line.split() for line in str_vertices]
+    vertices = [list(map(float, vert[2:])) for vert in split_vertices]
+
+    #extract edges
+    str_edges = lines[key_lines[2] + 1 : key_lines[3]]
+    split_edges = [edge.split() for edge in str_edges]
+    edges = [[list(map(float, edge[:3])), list(map(float, edge[4:7]))] for edge in split_edges]
+    edges = [[tuple(edge_part) for edge_part in edge] for edge in edges]
+
+    return {"symbol": symbol, "dimension": dimension, "cell": shape, "positions": vertices, "edges": edges}
+
+def cell_periods(shape):
+    shape = list(shape)
+    shape[3:6] = [np.radians(angle) for angle in shape[3:6]]
+    angleA = np.arccos((np.cos(shape[3]) - np.cos(shape[4]) * np.cos(shape[5])) /
+                       (np.sin(shape[4]) * np.sin(shape[5])))
+    period3 = [
+        np.cos(shape[4]),
+        np.sin(shape[4]) * np.cos(angleA),
+        np.sin(shape[4]) * np.sin(angleA)
+    ]
+    periods = np.array([
+        [shape[0], 0, 0],
+        [shape[1] * np.cos(shape[-1]), shape[1] * np.sin(shape[-1]), 0],
+        [shape[2] * period3[0], shape[2] * period3[1], shape[2] * period3[2]]
+    ])
+    return periods
+
+def wrap(points):
+    points = np.mod(points, 1.0)
+    points[points >= 1.0] = 0.0
+    return points
+
+def find_vertex_indices(targets, vertices, tol=1e-3):
+    """Match fractional points to vertices modulo the lattice; returns vertex indices (-1 if missing, -2 if ambiguous) and cells"""
+    tree = cKDTree(wrap(np.array(vertices, dtype=float)), boxsize=1.0)
+    matches = tree.query_ball_point(wrap(np.array(targets, dtype=float)), r=tol, p=np.inf)
+    counts = np.array([len(m) for m in matches], dtype=int)
+    indices = np.where(counts == 1, [m[0] if len(m) == 1 else -1 for m in matches], -1)
+    indices[counts > 1] = -2
+    cells = np.rint(targets - vertices[np.maximum(indices, 0)]).astype(int)
+    return indices, cells
+
+def make_halfedges(vertices, edges, verbose=False):
+    edges = np.array(edges, dtype=float).reshape(-1, 2, 3)
+    indices, cells = find_vertex_indices(edges.reshape(-1, 3), vertices)
+    indices = indices.reshape(-1, 2)
+    cells = cells.reshape(-1, 2, 3)
+    problems = [f"Edge {edges[e].tolist()}: vertex {'not found' if indices[e, k] == -1 else 'ambiguous'} for {edges[e, k].tolist()}"
+                for e, k in zip(*np.nonzero(indices < 0))]
+    if problems:
+        if verbose:
+            for problem in problems:
+                print(problem)
+        raise ValueError(f"{len(problems)} unmatched edge endpoints, first: {problems[0]}")
+    v1, v2 = indices[:, 0], indices[:, 1]
+    cell = cells[:, 1] - cells[:, 0]
+    nonzero = np.any(cell != 0, axis=1)
+    keep = np.nonzero((v1 < v2) | ((v1 == v2) & nonzero))[0]
+
+    halfedges = []
+    inversions = []
+    for v1, v2, cell in zip(v1[keep].tolist(), v2[keep].tolist(), cell[keep].tolist()):
+        halfedges.append([v1, v2, cell])
+        halfedges.append([v2, v1, [-c for c in cell]])
+        inversions.extend([len(halfedges)-1, len(halfedges) - 2])
+    return halfedges, inversions
+
+def build_network(record, verbose=False):
+    """Turn a parsed Systre record into the periods/vertices/halfedges/inversions structure of network_data.json"""
+    if record["dimension"] != 3:
+        raise ValueError("Dimension is not 3.")
+    periods = cell_periods(record["cell"])
+    if verbose:
+        norms = [float(np.linalg.norm(period)) for period in periods]
+        angle_12 = np.degrees(np.arccos(np.dot(periods[0], periods[1]) / (norms[0] * norms[1])))
+        angle_23 = np.degrees(np.arccos(np.dot(periods[1], periods[2]) / (norms[1] * norms[2])))
+        angle_31 = np.degrees(np.arccos(np.dot(periods[2], periods[0]) / (norms[2] * norms[0])))
+        print("Norms:", norms)
+        print("Angle between periods 1 and 2 (degrees):", angle_12)
+        print("Angle between periods 2 and 3 (degrees):", angle_23)
+        print("Angle between periods 3 and 1 (degrees):", angle_31)
+
+    vertices = [[vv if vv < 1.0 else 0.0 for vv in vert] for vert in record["positions"]]
+    if verbose:
+        print("Vertices", vertices)
+
+    # compute halfedges and inversions
+    edges = record["edges"]
+    if verbose:
+        for edge in edges:
+            print(edge)
+        print(len(edges))
+    vertices = np.array(vertices)
+    halfedges, inversions = make_halfedges(vertices, edges, verbose)
+    if verbose:
+        print("Halfedges:", halfedges)
+        print("Inversions:", inversions)
+
+    vertices = np.dot(vertices, periods)
+    if verbose:
+        print("Transformed vertices:", vertices)
+
+    return {
+        "periods": periods.tolist(),
+        "vertices": vertices.tolist(),
+        "halfedges": halfedges,
+        "inversions": inversions,
+        "normals": []
+    }
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python RotationSystem3D.py <network_name> [--relaxed] [--no-cache]")
+        sys.exit(1)
+
+    network_name = sys.argv[1]
+    mode = "relaxed" if "--relaxed" in sys.argv[2:] else "barycentric"
+    cache = None if "--no-cache" in sys.argv[2:] else SystreCache(SYSTRE_JAR)
+    systre_output = run_systre(network_name, mode, cache)
+    if cache is not None:
+        print("Cache:", cache.close())
+    record = parse_systre(systre_output.splitlines())
+    print("Symbol:", record["symbol"])
+    if record["dimension"] != 3:
+        raise SystemExit("Aborted: Dimension is not 3.")
+    output_data = build_network(record, verbose=True)
+
+    with open("network_data.json", "w") as f:
+        json.dump(output_data, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,211 @@
 import json
 import numpy as np
+from PeriodicGraph import PeriodicGraph
 
-with open("network_data.json") as f:
-    data = json.load(f)
-    periods = data["periods"]
-    vertices = data["vertices"]
-    halfedges = data["halfedges"]
-    inversions = data["inversions"]
-    normals = data["normals"]
-
-adj = [[] for _ in range(len(vertices))]
-for h_idx, h in enumerate(halfedges):
-    adj[h[0]].append(h_idx)
-
-def angle(vec, normal, ref_dir):
-    proj = vec - np.dot(vec, normal) * normal / np.linalg.norm(normal)**2
-    proj = proj / np.linalg.norm(proj)
-    ang = np.arctan2(np.dot(np.cross(ref_dir, proj), normal), np.dot(ref_dir, proj))
-    return ang
-
-rotations = [None] * len(halfedges)
-for v in range(len(vertices)):
-    neighbors = []
-    halfedge_indices = []
-    v1 = vertices[v]
-    for h_idx in adj[v]:
-        h = halfedges[h_idx]
-        u, cell = h[1], h[-1]
-        v2 = np.array(vertices[u]) + np.dot(cell, periods)
-        edge_vector = np.array(v2) - np.array(v1)
-        neighbors.append(edge_vector)
-        halfedge_indices.append(h_idx)
-    neighbors = np.array(neighbors)
-    normal = np.array(normals[v])
-    ref_dir = neighbors[0] - np.dot(neighbors[0], normal) * normal / np.linalg.norm(normal)**2
-    ref_dir = ref_dir / np.linalg.norm(ref_dir)
-    order = sorted(range(len(neighbors)), key=lambda i: angle(neighbors[i], normal, ref_dir))
-    for i in range(len(order)):
-        h_idx = halfedge_indices[order[i]]
-        next_h_idx = halfedge_indices[order[(i+1)%len(order)]]
-        rotations[h_idx] = next_h_idx
-    
-# Construct faces
-visited = [False] * len(halfedges)
-faces = []
-for h_start in range(len(halfedges)):
-    if not visited[h_start]:
-        f = [h_start]
-        cell = [0, 0, 0]
-        while True:
-            h = f[-1]
-            if all(c == 0 for c in cell):
-                visited[h] = True
-            next_h = rotations[inversions[h]]
-            if next_h == f[0]:
-                break
-            f.append(next_h)
-            cell = [c + dc for c, dc in zip(cell, halfedges[h][2])]
-        faces.append(f)
-
-trivial_faces = True
-
-for f in faces:
-    cell = [0, 0, 0]
-    for h_idx in f:
-        cell = [c + dc for c, dc in zip(cell, halfedges[h_idx][2])]
-    if any(c != 0 for c in cell):
-        trivial_faces = False
-        break
-
-data.pop("normals", None)
-data["faces"] = faces
-with open("surface_data.json", "w") as f:
-    json.dump(data, f, indent=2)
-if trivial_faces:
-    print("true")
-else:
-    print("false")
\ No newline at end of file
+def make_rotations(graph, normals):
+    """Successor of every halfedge in the counterclockwise order of its star around the vertex normal.
+    Angles are measured from the first halfedge of each star; all stars are sorted in one pass."""
+    normals = np.asarray(normals, dtype=float).reshape(-1, 3)
+    halfedges = graph.order
+    origin = graph.origin[halfedges]
+    normal = normals[origin]
+    vec = graph.vectors[halfedges]
+    proj = vec - (np.einsum("ij,ij->i", vec, normal) / np.einsum("ij,ij->i", normal, normal))[:, None] * normal
+    proj /= np.linalg.norm(proj, axis=1)[:, None]
+    ref_dir = proj[graph.offsets[origin]]
+    ang = np.arctan2(np.einsum("ij,ij->i", np.cross(ref_dir, proj), normal), np.einsum("ij,ij->i", ref_dir, proj))
+    # stable, so equal angles keep star order
+    ordered = halfedges[np.lexsort((ang, origin))]
+    position = np.arange(len(ordered))
+    last = position + 1 == graph.offsets[origin + 1]
+    rotations = np.empty(len(ordered), dtype=np.int64)
+    rotations[ordered] = ordered[np.where(last, graph.offsets[origin], position + 1)]
+    return rotations
+
+def face_cycles(permutation):
+    """Cycle decomposition of a permutation: the elements listed cycle by cycle in traversal order,
+    each cycle starting at its smallest element, and the offsets of the cycles in that list"""
+    n = len(permutation)
+    # smallest element of each cycle and distance to the end of the cycle, both by pointer doubling
+    label = np.arange(n)
+    jump = np.asarray(permutation)
+    steps = 1
+    while steps < n:
+        label = np.minimum(label, label[jump])
+        jump = jump[jump]
+        steps *= 2
+    last = permutation == label
+    jump = np.where(last, np.arange(n), permutation)
+    distance = (~last).astype(np.int64)
+    steps = 1
+    while steps < n:
+        distance = distance + distance[jump]
+        jump = jump[jump]
+        steps *= 2
+    cycles = np.lexsort((-distance, label))
+    offsets = np.flatnonzero(np.diff(label[cycles], prepend=-1))
+    return cycles, np.append(offsets, n)
+
+def face_starts(cycles, offsets, prefix, totals):
+    """Positions in cycles at which faces start.  A face starts at the smallest halfedge of the cycle not
+    yet visited, and visits every halfedge reached from there with a zero cell sum, so closed faces
+    are traced once per translate they pass through and bands once per lift to the universal cover."""
+    lengths = np.diff(offsets)
+    cycle_id = np.repeat(np.arange(len(lengths)), lengths)
+    closed = ~totals.any(axis=1)
+    # in closed faces the halfedges with equal prefix sums form one face starting at the smallest of them
+    members = np.flatnonzero(closed[cycle_id])
+    _, group = np.unique(np.column_stack([cycle_id[members], prefix[members]]), axis=0, return_inverse=True)
+    smallest = np.full(group.max() + 1 if len(group) else 0, len(cycles))
+    np.minimum.at(smallest, group.ravel(), cycles[members])
+    position = np.empty(len(cycles), dtype=np.int64)
+    position[cycles] = np.arange(len(cycles))
+    starts = position[smallest].tolist()
+
+    for c in np.flatnonzero(~closed).tolist():
+        s, e = offsets[c], offsets[c + 1]
+        sums = [tuple(p) for p in prefix[s:e].tolist()]
+        total = tuple(totals[c].tolist())
+        at = {}
+        for i, p in enumerate(sums):
+            at.setdefault(p, []).append(i)
+        visited = set()
+        for a in np.argsort(cycles[s:e]).tolist():
+            if a in visited:
+                continue
+            starts.append(s + a)
+            visited.update(b for b in at[sums[a]] if b >= a)
+            before = tuple(p - t for p, t in zip(sums[a], total))
+            visited.update(b for b in at.get(before, ()) if b < a)
+    return np.array(starts, dtype=np.int64)
+
+def expand_faces(graph, cycles, offsets):
+    """Faces traced from the cycles of rotation o inversion (listed in cycles, split at offsets, each starting
+    at its smallest halfedge), and the cell sum of every cycle"""
+    cells = graph.cells[cycles].astype(np.int64)
+    totals = np.add.reduceat(cells, offsets[:-1], axis=0) if len(cells) else np.zeros((0, 3), dtype=np.int64)
+    lengths = np.diff(offsets)
+    cumulative = np.cumsum(cells, axis=0) - cells
+    prefix = cumulative - np.repeat(cumulative[offsets[:-1]], lengths, axis=0)
+
+    starts = face_starts(cycles, offsets, prefix, totals)
+    starts = starts[np.argsort(cycles[starts])]
+    cycle_id = np.searchsorted(offsets, starts, side="right") - 1
+    begin, size = offsets[cycle_id], lengths[cycle_id]
+    face_offsets = np.cumsum(size)
+    step = np.arange(face_offsets[-1] if len(size) else 0) - np.repeat(face_offsets - size, size)
+    index = np.repeat(begin, size) + (np.repeat(starts - begin, size) + step) % np.repeat(size, size)
+    faces = [f.tolist() for f in np.split(cycles[index], face_offsets[:-1])]
+    return faces, totals
+
+def make_faces(graph, normals):
+    """Trace the faces of the rotation system given by the normals; returns the faces and whether all are trivial.
+    Faces are the cycles of rotation o inversion, their cell sums are reduced over all cycles at once."""
+    rotations = make_rotations(graph, normals)
+    faces, totals = expand_faces(graph, *face_cycles(rotations[graph.inversion]))
+    return faces, not totals.any()
+
+class FaceStructure:
+    """Face cycles of a rotation system with their cell sums, updated in place when the rotation at one vertex
+    changes.  Only the cycles through the halfedges entering that vertex are retraced."""
+
+    def __init__(self, graph, rotations):
+        self.graph = graph
+        self.rotations = np.array(rotations).tolist()
+        self.inversion = graph.inversion.tolist()
+        self.cells = [tuple(c) for c in graph.cells.tolist()]
+        cycles, offsets = face_cycles(np.asarray(self.rotations)[graph.inversion])
+        self.cycles = {i: cycles[offsets[i]:offsets[i + 1]].tolist() for i in range(len(offsets) - 1)}
+        self.face_of = [0] * graph.num_halfedges
+        self.sums = {}
+        self.nontrivial = 0
+        for i, cycle in self.cycles.items():
+            self.add_sum(i, cycle)
+        self.next_id = len(self.cycles)
+
+    @classmethod
+    def from_normals(cls, graph, normals):
+        return cls(graph, make_rotations(graph, normals))
+
+    @property
+    def num_faces(self):
+        return len(self.cycles)
+
+    @property
+    def trivial(self):
+        return self.nontrivial == 0
+
+    def add_sum(self, i, cycle):
+        for h in cycle:
+            self.face_of[h] = i
+        total = tuple(map(sum, zip(*(self.cells[h] for h in cycle))))
+        self.sums[i] = total
+        if any(total):
+            self.nontrivial += 1
+
+    def set_vertex_rotation(self, v, order):
+        """Make order (the halfedges leaving v, in cyclic order) the rotation at v and retrace the faces
+        through v.  Returns the ids of the removed and of the new faces."""
+        star = self.graph.star(v).tolist()
+        if sorted(order) != sorted(star):
+            raise ValueError(f"{order} is not an ordering of the halfedges leaving vertex {v}")
+        removed = sorted({self.face_of[self.inversion[g]] for g in star})
+        for g, nxt in zip(order, order[1:] + order[:1]):
+            self.rotations[g] = nxt
+        touched = []
+        for i in removed:
+            touched.extend(self.cycles.pop(i))
+            if any(self.sums.pop(i)):
+                self.nontrivial -= 1
+        retraced = set()
+        added = []
+        for h in touched:
+            if h in retraced:
+                continue
+            cycle = [h]
+            nxt = self.rotations[self.inversion[h]]
+            while nxt != h:
+                cycle.append(nxt)
+                nxt = self.rotations[self.inversion[nxt]]
+            retraced.update(cycle)
+            first = cycle.index(min(cycle))
+            cycle = cycle[first:] + cycle[:first]
+            self.cycles[self.next_id] = cycle
+            self.add_sum(self.next_id, cycle)
+            added.append(self.next_id)
+            self.next_id += 1
+        return removed, added
+
+    def reverse_vertex(self, v):
+        """Reverse the cyclic order at v, as flipping its normal does"""
+        order = [int(self.graph.star(v)[0])]
+        while self.rotations[order[-1]] != order[0]:
+            order.append(self.rotations[order[-1]])
+        return self.set_vertex_rotation(v, order[::-1])
+
+    def faces(self):
+        """Faces in the form returned by make_faces"""
+        cycles = sorted(self.cycles.values())
+        offsets = np.cumsum([0] + [len(c) for c in cycles])
+        return expand_faces(self.graph, np.array([h for c in cycles for h in c], dtype=np.int64), offsets)[0]
+
+def surface_data(data, faces):
+    surface = dict(data)
+    surface.pop("normals", None)
+    surface["faces"] = faces
+    return surface
+
+def main():
+    with open("network_data.json") as f:
+        data = json.load(f)
+    faces, trivial_faces = make_faces(PeriodicGraph.from_data(data), data["normals"])
+
+    with open("surface_data.json", "w") as f:
+        json.dump(surface_data(data, faces), f, indent=2)
+    if trivial_faces:
+        print("true")
+    else:
+        print("false")
+
+if __name__ == "__main__":
+    main()
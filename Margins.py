@@ -0,0 +1,74 @@
+import sys
+import os
+import re
+import json
+from Coplanar import coplanar_margins
+from Orthogonal import orthogonal_margin
+
+def net_margins(graph):
+    """Geometric margins of a network, from which the coplanar/orthogonal tests can be redone for any tolerance"""
+    return {
+        "degree": graph.degrees().tolist(),
+        "star": coplanar_margins(graph).tolist(),
+        "orthogonal": orthogonal_margin(graph),
+    }
+
+def margins_file(label):
+    return f"margins-{label}.json"
+
+def read_margins(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+def write_margins(margins, filename):
+    with open(filename, "w") as f:
+        json.dump(margins, f)
+
+def classify(margins, tol=1e-3, ortho_tol=None):
+    """Networks that are coplanar, and coplanar without orthogonal edges, for the given tolerances"""
+    if ortho_tol is None:
+        ortho_tol = tol
+    coplanar = [sym for sym, m in margins.items() if max(m["star"], default=0.0) <= tol]
+    orthogonal = [sym for sym in coplanar if margins[sym]["orthogonal"] > ortho_tol]
+    return coplanar, orthogonal
+
+def compute(symbols, source, mode):
+    from Pipeline import load_networks
+    from PeriodicGraph import PeriodicGraph
+    margins = {}
+    for sym, data, error in load_networks(symbols, source, mode):
+        if data is None:
+            print(f"{sym}: {error}", file=sys.stderr)
+            continue
+        margins[sym] = net_margins(PeriodicGraph.from_data(data))
+    return {sym: margins[sym] for sym in symbols if sym in margins}
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python Margins.py <margins_file> [--tol T] [--ortho-tol T]\n"
+              "       python Margins.py --compute <symbols_file> [--arc] [--relaxed]")
+        sys.exit(1)
+    args = sys.argv[1:]
+    if args[0] == "--compute":
+        from SystreBatch import read_symbols
+        source = "arc" if "--arc" in args else "systre"
+        mode = "relaxed" if "--relaxed" in args else "barycentric"
+        label = "arc" if source == "arc" else mode
+        margins = compute(read_symbols(args[1]), source, mode)
+        write_margins(margins, margins_file(label))
+        print(f"{len(margins)} networks written to {margins_file(label)}")
+        return
+
+    tol = float(args[args.index("--tol") + 1]) if "--tol" in args else 1e-3
+    ortho_tol = float(args[args.index("--ortho-tol") + 1]) if "--ortho-tol" in args else None
+    m = re.match(r"margins-(.+)\.json$", os.path.basename(args[0]))
+    label = m.group(1) if m else "barycentric"
+    coplanar, orthogonal = classify(read_margins(args[0]), tol, ortho_tol)
+    for filename, syms in [(f"coplanar-{label}.dat", coplanar), (f"orthogonal-{label}.dat", orthogonal)]:
+        with open(filename, "w") as f:
+            for sym in syms:
+                f.write(sym + "\n")
+        print(f"{filename}: {len(syms)} networks")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import sys
+import os
+import json
+import time
+import struct
+import tempfile
+import numpy as np
+from Triangulate import load_mesh, triangulation_mode, Mesh
+from ExportSTL import write_stl
+from CheckEmbed import read_stl
+
+FORMATS = ["ply", "obj", "glb"]
+
+PLY_FACE_DTYPE = np.dtype([("count", "u1"), ("vertex_indices", "<i4", (3,)), ("face_id", "<i4"), ("band", "u1")])
+
+def write_ply(mesh, filename):
+    """Binary little-endian PLY with the face ID and band flag of every triangle as face properties"""
+    faces = np.empty(len(mesh.triangles), dtype=PLY_FACE_DTYPE)
+    faces["count"] = 3
+    faces["vertex_indices"] = mesh.triangles
+    faces["face_id"] = mesh.faces
+    faces["band"] = mesh.bands
+    header = ("ply\nformat binary_little_endian 1.0\n"
+              f"element vertex {len(mesh.vertices)}\nproperty float x\nproperty float y\nproperty float z\n"
+              f"element face {len(faces)}\nproperty list uchar int vertex_indices\n"
+              "property int face_id\nproperty uchar band\nend_header\n")
+    with open(filename, "wb") as f:
+        f.write(header.encode("ascii"))
+        mesh.vertices.astype("<f4").tofile(f)
+        faces.tofile(f)
+
+def read_ply(filename):
+    """Mesh of a PLY file written by write_ply"""
+    with open(filename, "rb") as f:
+        counts = {}
+        while True:
+            line = f.readline().decode("ascii").split()
+            if line[0] == "element":
+                counts[line[1]] = int(line[2])
+            elif line[0] == "end_header":
+                break
+        vertices = np.fromfile(f, dtype="<f4", count=3 * counts["vertex"]).reshape(-1, 3)
+        faces = np.fromfile(f, dtype=PLY_FACE_DTYPE, count=counts["face"])
+    return Mesh(vertices, faces["vertex_indices"], faces["face_id"], faces["band"] > 0, [])
+
+def write_obj(mesh, filename):
+    """OBJ with one group per face (named by its face ID) and the material "band" or "face" """
+    starts = np.flatnonzero(np.diff(mesh.faces, prepend=-1) != 0)
+    ends = np.append(starts[1:], len(mesh.faces))
+    with open(filename, "w") as f:
+        np.savetxt(f, mesh.vertices, fmt="v %.6e %.6e %.6e")
+        for s, e in zip(starts, ends):
+            f.write(f"g face{mesh.faces[s]}\nusemtl {'band' if mesh.bands[s] else 'face'}\n")
+            np.savetxt(f, mesh.triangles[s:e] + 1, fmt="f %d %d %d")
+
+def read_obj(filename):
+    """Mesh of an OBJ file written by write_obj"""
+    vertices, triangles, faces, bands = [], [], [], []
+    face, band = -1, False
+    with open(filename) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == "v":
+                vertices.append([float(x) for x in parts[1:4]])
+            elif parts[0] == "f":
+                triangles.append([int(x.split("/")[0]) - 1 for x in parts[1:4]])
+                faces.append(face)
+                bands.append(band)
+            elif parts[0] == "g":
+                face = int(parts[1][len("face"):])
+            elif parts[0] == "usemtl":
+                band = parts[1] == "band"
+    return Mesh(vertices, triangles, faces, bands, [])
+
+def write_glb(mesh, filename):
+    """Binary glTF 2.0 with float32 positions and uint32 indices; the face ID and band flag of every triangle are
+    stored as the custom vertex attributes _FACE_ID and _BAND (float32, as custom attributes may not be uint32),
+    so vertices shared by several faces are split"""
+    corners = np.stack([mesh.triangles.ravel(), np.repeat(mesh.faces, 3), np.repeat(mesh.bands, 3)], axis=1)
+    split, inverse = np.unique(corners, axis=0, return_inverse=True)
+    arrays = [mesh.vertices[split[:, 0]].astype("<f4"), inverse.reshape(-1).astype("<u4"),
+              split[:, 1].astype("<f4"), split[:, 2].astype("<f4")]
+    # component type, accessor type, count
+    layouts = [(5126, "VEC3", len(split)), (5125, "SCALAR", mesh.triangles.size),
+               (5126, "SCALAR", len(split)), (5126, "SCALAR", len(split))]
+    views, accessors, offset = [], [], 0
+    for i, (array, (component, kind, count)) in enumerate(zip(arrays, layouts)):
+        views.append({"buffer": 0, "byteOffset": offset, "byteLength": array.nbytes, "target": 34962})
+        accessors.append({"bufferView": i, "componentType": component, "type": kind, "count": count})
+        offset += -(-array.nbytes // 4) * 4
+    views[1]["target"] = 34963
+    if len(split):
+        accessors[0]["min"] = arrays[0].min(axis=0).tolist()
+        accessors[0]["max"] = arrays[0].max(axis=0).tolist()
+    gltf = {
+        "asset": {"version": "2.0", "generator": "EmbedMOF MeshExport.py"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "_FACE_ID": 2, "_BAND": 3}, "indices": 1,
+                                    "mode": 4}]}],
+        "buffers": [{"byteLength": offset}],
+        "bufferViews": views,
+        "accessors": accessors,
+    }
+    content = json.dumps(gltf, separators=(",", ":")).encode()
+    content += b" " * (-len(content) % 4)
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(content) + 8 + offset))
+        f.write(struct.pack("<I4s", len(content), b"JSON"))
+        f.write(content)
+        f.write(struct.pack("<I4s", offset, b"BIN\0"))
+        for array in arrays:
+            array.tofile(f)
+            f.write(b"\0" * (-array.nbytes % 4))
+
+def read_glb(filename):
+    """Mesh of a GLB file written by write_glb, with the face ID and band flag of every triangle taken from its
+    first corner"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    length, _ = struct.unpack_from("<I4s", data, 12)
+    gltf = json.loads(data[20:20 + length])
+    binary = memoryview(data)[20 + length + 8:]
+    dtypes = {5126: "<f4", 5125: "<u4", 5121: "u1"}
+    sizes = {"SCALAR": 1, "VEC3": 3}
+
+    def accessor(i):
+        acc = gltf["accessors"][i]
+        view = gltf["bufferViews"][acc["bufferView"]]
+        array = np.frombuffer(binary, dtype=dtypes[acc["componentType"]], count=acc["count"] * sizes[acc["type"]],
+                              offset=view["byteOffset"])
+        return array.reshape(acc["count"], -1) if sizes[acc["type"]] > 1 else array
+
+    primitive = gltf["meshes"][0]["primitives"][0]
+    attributes = primitive["attributes"]
+    triangles = accessor(primitive["indices"]).reshape(-1, 3)
+    first = triangles[:, 0]
+    return Mesh(accessor(attributes["POSITION"]), triangles, accessor(attributes["_FACE_ID"])[first].astype(int),
+                accessor(attributes["_BAND"])[first] > 0, [])
+
+def write_mesh(mesh, filename, fmt):
+    {"ply": write_ply, "obj": write_obj, "glb": write_glb}[fmt](mesh, filename)
+
+def read_mesh(filename, fmt):
+    return {"ply": read_ply, "obj": read_obj, "glb": read_glb}[fmt](filename)
+
+def report(mesh, directory):
+    """Size, write time and load time of the mesh in every format, next to ASCII and binary STL,
+    written into directory"""
+    rows = []
+    for name in ["stl", "stl-binary"] + FORMATS:
+        filename = os.path.join(directory, "surface." + {"stl": "stl", "stl-binary": "bin.stl"}.get(name, name))
+        start = time.time()
+        if name in FORMATS:
+            write_mesh(mesh, filename, name)
+        else:
+            write_stl(mesh.triangle_vertices(), filename, name == "stl-binary")
+        written = time.time()
+        if name in FORMATS:
+            loaded = len(read_mesh(filename, name).triangles)
+        else:
+            loaded = len(read_stl(filename))
+        if loaded != len(mesh.triangles):
+            raise ValueError(f"{filename} holds {loaded} triangles, expected {len(mesh.triangles)}")
+        rows.append((name, os.path.getsize(filename), written - start, time.time() - written))
+    return rows
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0].startswith("--"):
+        print("Usage: python MeshExport.py <network_name> [--format ply|obj|glb|all] [--triangulation fan|ear] "
+              "[--report]")
+        sys.exit(1)
+    network_name = args[0]
+    fmt = args[args.index("--format") + 1] if "--format" in args else "ply"
+    if fmt != "all" and fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt}, expected one of {FORMATS} or all")
+    mesh = load_mesh("surface_data.json", triangulation_mode(args))
+    if "--report" in args:
+        print(f"{len(mesh.vertices)} vertices, {len(mesh.triangles)} triangles")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, size, write_time, load_time in report(mesh, directory):
+                print(f"{name:>10}: {size:>10} bytes, write {write_time:.4f} s, load {load_time:.4f} s")
+        return
+    for name in FORMATS if fmt == "all" else [fmt]:
+        write_mesh(mesh, f"models/{network_name}.{name}", name)
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,32 @@
 import json
 import numpy as np
+from PeriodicGraph import PeriodicGraph
 
-with open("network_data.json") as f:
-    data = json.load(f)
-    periods = data["periods"]
-    vertices = data["vertices"]
-    halfedges = data["halfedges"]
+def normal_dots(graph):
+    """Dot products of the normal vectors at both ends of every halfedge"""
+    _, normals = graph.star_svd()
+    return np.einsum("ij,ij->i", normals[graph.origin], normals[graph.target])
 
-adj = [[] for _ in range(len(vertices))]
-for h in halfedges:
-    adj[h[0]].append((h[1], h[-1]))
+def orthogonal_margin(graph):
+    """Smallest |n1.n2| over all halfedges"""
+    dots = normal_dots(graph)
+    return float(np.min(np.abs(dots))) if len(dots) else np.inf
 
-normals = []
-for v in range(len(vertices)):
-    neighbors = []
-    v1 = vertices[v]
-    for u, cell in adj[v]:
-        v2 = np.array(vertices[u]) + np.dot(cell, periods)
-        edge_vector = np.array(v2) - np.array(v1)
-        neighbors.append(edge_vector)
-    neighbors = np.array(neighbors)
+def has_orthogonal_edge(graph, tol=1e-3, verbose=False):
+    dots = normal_dots(graph)
+    orthogonal = np.nonzero(np.abs(dots) <= tol)[0]
+    if len(orthogonal) and verbose:
+        _, normals = graph.star_svd()
+        h = orthogonal[0]
+        print(f"for halfedge {h} are orthogonal: {normals[graph.origin[h]]}, {normals[graph.target[h]]}, {dots[h]}")
+    return len(orthogonal) > 0
 
-    _, _, vh = np.linalg.svd(neighbors)
-    normal = vh[-1]
-    normal = normal / np.linalg.norm(normal)
-    normals.append(normal)
+def main():
+    with open("network_data.json") as f:
+        data = json.load(f)
+    graph = PeriodicGraph.from_data(data)
+    orthogonal = has_orthogonal_edge(graph, tol=1e-3, verbose=True)  # tolerance for numerical errors
+    print("true" if orthogonal else "false")
 
-orthogonal = False
-tol = 1e-3  # tolerance for numerical errors
-
-for h in range(len(halfedges)):
-    v1 = halfedges[h][0]
-    n1 = normals[v1]
-    v2 = halfedges[h][1]
-    n2 = normals[v2]
-    dot_product = np.dot(n1, n2)
-    if np.isclose(dot_product, 0, atol=tol):
-        print(f"for halfedge {h} are orthogonal: {n1}, {n2}, {dot_product}")
-        orthogonal = True
-        break
-
-print("true" if orthogonal else "false")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
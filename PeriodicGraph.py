@@ -0,0 +1,59 @@
+import numpy as np
+
+class PeriodicGraph:
+    """Half-edges of a periodic network stored as integer arrays, grouped by origin vertex in CSR style"""
+
+    def __init__(self, periods, vertices, halfedges, inversions):
+        self.periods = np.asarray(periods, dtype=float).reshape(3, 3)
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        n = len(halfedges)
+        self.origin = np.fromiter((h[0] for h in halfedges), dtype=np.int32, count=n)
+        self.target = np.fromiter((h[1] for h in halfedges), dtype=np.int32, count=n)
+        self.cells = np.array([h[2] for h in halfedges], dtype=np.int32).reshape(n, 3)
+        self.inversion = np.asarray(inversions, dtype=np.int32)
+        # halfedges sorted by origin (keeping their index order), star of v is order[offsets[v]:offsets[v+1]]
+        self.order = np.argsort(self.origin, kind="stable").astype(np.int32)
+        self.offsets = np.zeros(len(self.vertices) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.origin, minlength=len(self.vertices)), out=self.offsets[1:])
+        self.vectors = self.vertices[self.target] + self.cells @ self.periods - self.vertices[self.origin]
+        self._svd = None
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(data["periods"], data["vertices"], data["halfedges"], data["inversions"])
+
+    @property
+    def num_vertices(self):
+        return len(self.vertices)
+
+    @property
+    def num_halfedges(self):
+        return len(self.origin)
+
+    def degrees(self):
+        return np.diff(self.offsets)
+
+    def star(self, v):
+        """Indices of the halfedges leaving v"""
+        return self.order[self.offsets[v]:self.offsets[v + 1]]
+
+    def star_svd(self):
+        """Singular values (padded with zeros below degree 3) and unit normals of all vertex stars.
+        Vertices of equal degree are stacked and decomposed in one batched SVD; the result is cached."""
+        if self._svd is None:
+            degrees = self.degrees()
+            singular_values = np.zeros((self.num_vertices, 3))
+            normals = np.zeros((self.num_vertices, 3))
+            for d in np.unique(degrees):
+                if d == 0:
+                    continue
+                vs = np.nonzero(degrees == d)[0]
+                stars = self.vectors[self.order[self.offsets[vs][:, None] + np.arange(d)]]
+                _, s, vh = np.linalg.svd(stars)
+                singular_values[vs, :s.shape[1]] = s
+                normals[vs] = vh[:, -1] / np.linalg.norm(vh[:, -1], axis=1)[:, None]
+            self._svd = singular_values, normals
+        return self._svd
+
+    def halfedges(self):
+        return [[int(v1), int(v2), cell] for v1, v2, cell in zip(self.origin, self.target, self.cells.tolist())]
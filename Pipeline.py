@@ -0,0 +1,125 @@
+import sys
+import os
+from SystreBatch import read_symbols, run_batch
+from SystreCache import SystreCache
+from Halfedges import SYSTRE_JAR
+from Barycentric import load_arc, arc_network
+from PeriodicGraph import PeriodicGraph
+from Coplanar import is_coplanar
+from Orthogonal import has_orthogonal_edge
+from DFSNormal import assign_normals
+from MakeFaces import make_faces, surface_data
+from Triangulate import triangulate, triangulation_mode
+from ExportSTL import write_stl
+from Margins import net_margins, margins_file, write_margins
+
+stages = ["coplanar", "orthogonal", "dfs", "trivial"]
+
+def arc_networks(symbols):
+    entries = load_arc()
+    for sym in symbols:
+        if sym not in entries:
+            yield sym, None, "not found in the arc database"
+            continue
+        try:
+            yield sym, arc_network(entries[sym]["key"]), None
+        except Exception as ex:
+            yield sym, None, str(ex)
+
+def load_networks(symbols, source="systre", mode="barycentric", cache=None, large=(), workdir=None):
+    if source == "arc":
+        return arc_networks(symbols)
+    return run_batch(symbols, mode, large=large, workdir=workdir, cache=cache)
+
+def surface(data, graph=None):
+    """Orient the normals and trace the faces; None if the DFS assignment fails"""
+    if graph is None:
+        graph = PeriodicGraph.from_data(data)
+    normals = assign_normals(graph)
+    if normals is None:
+        return None, False
+    faces, trivial = make_faces(graph, normals)
+    return surface_data(data, faces), trivial
+
+def funnel(data, tol=1e-3, graph=None):
+    """Run coplanar -> orthogonal -> DFS -> trivial faces on one network, stopping at the first stage it fails"""
+    if graph is None:
+        graph = PeriodicGraph.from_data(data)
+    result = {"coplanar": is_coplanar(graph, tol)}
+    if not result["coplanar"]:
+        return result, None
+    # orthogonal-*.dat lists the networks with NO orthogonal edge
+    result["orthogonal"] = not has_orthogonal_edge(graph, tol)
+    if not result["orthogonal"]:
+        return result, None
+    surf, trivial = surface(data, graph)
+    result["dfs"] = surf is not None
+    if surf is None:
+        return result, None
+    result["trivial"] = trivial
+    return result, surf
+
+def output_files(label):
+    suffix = "" if label == "barycentric" else f"-{label}"
+    return {
+        "coplanar": f"coplanar-{label}.dat",
+        "orthogonal": f"orthogonal-{label}.dat",
+        "dfs": f"dfs-single{suffix}.dat",
+        "trivial": f"trivial-faces{suffix}.dat",
+    }
+
+def export_stl(sym, surf, triangulation="fan", binary=False):
+    write_stl(triangulate(surf, triangulation).triangle_vertices(), f"models/{sym}.stl", binary)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python Pipeline.py <symbols_file | -> [--arc] [--relaxed] [--no-cache] [--stl] [--export] "
+              "[--triangulation fan|ear] [--binary]")
+        sys.exit(1)
+    args = sys.argv[2:]
+    symbols = read_symbols("/dev/stdin" if sys.argv[1] == "-" else sys.argv[1])
+    source = "arc" if "--arc" in args else "systre"
+    mode = "relaxed" if "--relaxed" in args else "barycentric"
+    label = "arc" if source == "arc" else mode
+    cache = None if source == "arc" or "--no-cache" in args else SystreCache(SYSTRE_JAR)
+    large = set(read_symbols("symbols-large.dat")) if os.path.exists("symbols-large.dat") else set()
+    triangulation = triangulation_mode(args)
+    binary = "--binary" in args
+
+    passed = {stage: set() for stage in stages}
+    margins = {}
+    for sym, data, error in load_networks(symbols, source, mode, cache, large):
+        if data is None:
+            print(f"{sym}: {error}", file=sys.stderr)
+            continue
+        if "--export" in args:
+            # export only, like export_stl.sh
+            surf, _ = surface(data)
+            if surf is None:
+                print(f"{sym}: DFS assignment of normals failed", file=sys.stderr)
+            else:
+                export_stl(sym, surf, triangulation, binary)
+            continue
+        graph = PeriodicGraph.from_data(data)
+        margins[sym] = net_margins(graph)
+        result, surf = funnel(data, graph=graph)
+        for stage, ok in result.items():
+            if ok:
+                passed[stage].add(sym)
+        if surf is not None and result["trivial"] and "--stl" in args:
+            export_stl(sym, surf, triangulation, binary)
+        print(f"{sym}: " + " ".join(f"{stage}={ok}" for stage, ok in result.items()), file=sys.stderr)
+
+    if cache is not None:
+        print("Cache:", cache.close(), file=sys.stderr)
+    if "--export" in args:
+        return
+    for stage, filename in output_files(label).items():
+        with open(filename, "w") as f:
+            for sym in symbols:
+                if sym in passed[stage]:
+                    f.write(sym + "\n")
+    write_margins({sym: margins[sym] for sym in symbols if sym in margins}, margins_file(label))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import sys
+import json
+import time
+from collections import deque
+import numpy as np
+from PeriodicGraph import PeriodicGraph
+from Orthogonal import normal_dots
+from MakeFaces import make_rotations
+
+class RotationSearch:
+    """Backtracking search over the rotation systems of a locally planar network: every vertex takes the
+    angular order of its star around the normal, or its reverse.  The faces are built up as chains of
+    halfedges (the partial face cycles, kept in a union-find with undo), and a branch is cut as soon as
+    one of them closes with a non-zero cell sum.  Vertices with only one choice left are forced."""
+
+    def __init__(self, graph, budget=100000):
+        self.graph = graph
+        self.budget = budget
+        _, self.normals = graph.star_svd()
+        forward = make_rotations(graph, self.normals)
+        backward = np.empty_like(forward)
+        backward[forward] = np.arange(len(forward))
+        self.rotations = {1: forward.tolist(), -1: backward.tolist()}
+        self.inversion = graph.inversion.tolist()
+        self.stars = [graph.star(v).tolist() for v in range(graph.num_vertices)]
+        self.neighbors = [sorted(set(graph.target[star].tolist())) for star in self.stars]
+        acute = np.sign(normal_dots(graph)).astype(int)
+        self.acute = [list(zip(graph.target[star].tolist(), acute[star].tolist())) for star in self.stars]
+        self.parent = list(range(graph.num_halfedges))
+        self.size = [1] * graph.num_halfedges
+        self.sums = [tuple(c) for c in graph.cells.tolist()]
+        self.trail = []
+        self.sign = [0] * graph.num_vertices
+        self.assigned = []
+        self.stats = {"nodes": 0, "backtracks": 0, "forced": 0, "faces": 0, "depth": 0}
+
+    def find(self, h):
+        while self.parent[h] != h:
+            h = self.parent[h]
+        return h
+
+    def link(self, h, nxt):
+        """Join the chain ending in h to the chain starting at nxt; False if this closes a non-trivial face"""
+        a, b = self.find(h), self.find(nxt)
+        if a == b:
+            self.stats["faces"] += 1
+            return not any(self.sums[a])
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.sums[a] = tuple(x + y for x, y in zip(self.sums[a], self.sums[b]))
+        self.trail.append(b)
+        return True
+
+    def undo(self, trail_mark, assigned_mark):
+        while len(self.trail) > trail_mark:
+            b = self.trail.pop()
+            a = self.parent[b]
+            self.parent[b] = b
+            self.size[a] -= self.size[b]
+            self.sums[a] = tuple(x - y for x, y in zip(self.sums[a], self.sums[b]))
+        while len(self.assigned) > assigned_mark:
+            self.sign[self.assigned.pop()] = 0
+
+    def assign(self, v, s):
+        """Fix the orientation of v, which closes the links into every halfedge leaving v"""
+        self.sign[v] = s
+        self.assigned.append(v)
+        rotation = self.rotations[s]
+        return all(self.link(self.inversion[g], rotation[g]) for g in self.stars[v])
+
+    def choices(self, v):
+        if len(self.stars[v]) <= 2:
+            return [1]  # both orders are the same
+        # prefer the orientation making acute angles with the assigned neighbours, as DFSNormal.py would
+        vote = sum(self.sign[u] * a for u, a in self.acute[v])
+        return [1, -1] if vote >= 0 else [-1, 1]
+
+    def propagate(self, v):
+        """Force the neighbours left with a single consistent orientation; False on a dead end"""
+        queue = deque(self.neighbors[v])
+        while queue:
+            u = queue.popleft()
+            if self.sign[u]:
+                continue
+            feasible = []
+            for s in self.choices(u):
+                trail_mark, assigned_mark = len(self.trail), len(self.assigned)
+                if self.assign(u, s):
+                    feasible.append(s)
+                self.undo(trail_mark, assigned_mark)
+            if not feasible:
+                return False
+            if len(feasible) == 1:
+                self.stats["forced"] += 1
+                if not self.assign(u, feasible[0]):
+                    return False
+                queue.extend(self.neighbors[u])
+        return True
+
+    def search_order(self):
+        """Vertices in breadth-first order, with the first vertex of every component"""
+        order, roots = [], set()
+        seen = [False] * self.graph.num_vertices
+        for root in range(self.graph.num_vertices):
+            if seen[root]:
+                continue
+            roots.add(root)
+            seen[root] = True
+            queue = deque([root])
+            while queue:
+                v = queue.popleft()
+                order.append(v)
+                for u in self.neighbors[v]:
+                    if not seen[u]:
+                        seen[u] = True
+                        queue.append(u)
+        return order, roots
+
+    def run(self):
+        """Search for orientations giving only homologically trivial faces.
+        Returns the signs of the normals, or None if there is none or the node budget ran out."""
+        start = time.time()
+        order, roots = self.search_order()
+        frames = []
+        pos = 0
+        status = "found"
+        while True:
+            while pos < len(order) and self.sign[order[pos]]:
+                pos += 1
+            if pos == len(order):
+                break
+            v = order[pos]
+            # reversing every orientation of a component reverses its faces, so its first vertex is fixed
+            frames.append((v, pos, [1] if v in roots else self.choices(v), len(self.trail), len(self.assigned)))
+            self.stats["depth"] = max(self.stats["depth"], len(frames))
+            while frames and self.stats["nodes"] < self.budget:
+                v, pos, remaining, trail_mark, assigned_mark = frames[-1]
+                self.undo(trail_mark, assigned_mark)
+                if not remaining:
+                    frames.pop()
+                    self.stats["backtracks"] += 1
+                    continue
+                self.stats["nodes"] += 1
+                if self.assign(v, remaining.pop(0)) and self.propagate(v):
+                    break
+            else:
+                status = "none" if not frames else "budget"
+                break
+        self.stats["status"] = status
+        self.stats["seconds"] = round(time.time() - start, 3)
+        return np.array(self.sign) if status == "found" else None
+
+def search_normals(graph, budget=100000):
+    """Oriented normals whose rotation system has only trivial faces (or None), and the search statistics"""
+    search = RotationSearch(graph, budget)
+    sign = search.run()
+    normals = None if sign is None else search.normals * sign[:, None]
+    return normals, search.stats
+
+def main():
+    args = sys.argv[1:]
+    budget = int(args[args.index("--budget") + 1]) if "--budget" in args else 100000
+    if "--batch" in args:
+        from SystreBatch import read_symbols
+        from Pipeline import load_networks
+        source = "arc" if "--arc" in args else "systre"
+        mode = "relaxed" if "--relaxed" in args else "barycentric"
+        label = "arc" if source == "arc" else mode
+        symbols = read_symbols(args[args.index("--batch") + 1])
+        found = []
+        for sym, data, error in load_networks(symbols, source, mode):
+            if data is None:
+                print(f"{sym}: {error}", file=sys.stderr)
+                continue
+            normals, stats = search_normals(PeriodicGraph.from_data(data), budget)
+            if normals is not None:
+                found.append(sym)
+            print(f"{sym}: " + " ".join(f"{k}={v}" for k, v in stats.items()), file=sys.stderr)
+        with open(f"rotation-search-{label}.dat", "w") as f:
+            for sym in found:
+                f.write(sym + "\n")
+        print(f"{len(found)} of {len(symbols)} networks have a rotation system with trivial faces")
+        return
+
+    with open("network_data.json") as f:
+        data = json.load(f)
+    normals, stats = search_normals(PeriodicGraph.from_data(data), budget)
+    print(" ".join(f"{k}={v}" for k, v in stats.items()))
+    if normals is not None:
+        print("true")
+        # Save the normals to network_data.json, so that MakeFaces.py builds the rotation system found
+        data["normals"] = normals.tolist()
+        with open("network_data.json", "w") as f:
+            json.dump(data, f)
+    else:
+        print("false")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import sys
+import os
+import json
+import time
+import shutil
+import signal
+import resource
+import tempfile
+import multiprocessing
+from SystreBatch import read_symbols
+from SystreCache import SystreCache
+from Halfedges import SYSTRE_JAR
+from CgdIndex import CgdReader
+from Barycentric import load_arc
+from PeriodicGraph import PeriodicGraph
+from Pipeline import load_networks, funnel, output_files, export_stl
+from Triangulate import triangulation_mode
+from Margins import net_margins, margins_file, write_margins
+
+def network_sizes(symbols, source):
+    """Rough size of each network, used to schedule the largest ones first"""
+    if source == "arc":
+        entries = load_arc()
+        return {sym: len(entries[sym]["key"]) if sym in entries else 0 for sym in symbols}
+    with CgdReader() as reader:
+        return {sym: reader.size(sym) or 0 for sym in symbols}
+
+def read_checkpoint(filename):
+    done = {}
+    if os.path.exists(filename):
+        with open(filename) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # line cut short by an interrupted run
+                done[entry["symbol"]] = entry
+    return done
+
+def worker(sym, options, workdir):
+    """Run one network in its own process group and scratch directory, leaving the result in result.json"""
+    os.setpgrp()
+    entry = {"symbol": sym}
+    cache = SystreCache(SYSTRE_JAR) if options["cache"] else None
+    try:
+        for _, data, error in load_networks([sym], options["source"], options["mode"], cache, workdir=workdir):
+            if data is None:
+                entry.update(status="error", error=error)
+                break
+            # only now, so that the systre JVM (which reserves far more address space than it uses) is not capped
+            if options["memory"]:
+                limit = options["memory"] * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            graph = PeriodicGraph.from_data(data)
+            margins = net_margins(graph)
+            result, surf = funnel(data, graph=graph)
+            entry.update(status="ok", result=result, margins=margins)
+            if surf is not None and result["trivial"] and options["stl"]:
+                export_stl(sym, surf, options["triangulation"], options["binary"])
+    except MemoryError:
+        entry.update(status="memory", error="memory limit exceeded")
+    except Exception as ex:
+        entry.update(status="error", error=str(ex))
+    if cache is not None:
+        cache.close()
+    with open(os.path.join(workdir, "result.tmp"), "w") as f:
+        json.dump(entry, f)
+    os.replace(os.path.join(workdir, "result.tmp"), os.path.join(workdir, "result.json"))
+
+def collect(proc, workdir, sym):
+    try:
+        with open(os.path.join(workdir, "result.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"symbol": sym, "status": "killed", "error": f"worker exited with status {proc.exitcode}"}
+
+def schedule(symbols, options, jobs, timeout, checkpoint, retry=False):
+    """Run all networks not yet in the checkpoint file on a pool of worker processes, largest first"""
+    done = read_checkpoint(checkpoint)
+    if retry:
+        done = {sym: entry for sym, entry in done.items() if entry["status"] == "ok"}
+    todo = [sym for sym in symbols if sym not in done]
+    sizes = network_sizes(todo, options["source"])
+    todo.sort(key=lambda sym: -sizes[sym])
+    scratch = tempfile.mkdtemp(prefix="schedule_")
+    context = multiprocessing.get_context("fork")
+    running = {}
+    try:
+        with open(checkpoint, "a") as log:
+            while todo or running:
+                while todo and len(running) < jobs:
+                    sym = todo.pop(0)
+                    workdir = tempfile.mkdtemp(prefix=f"{sym}_", dir=scratch)
+                    proc = context.Process(target=worker, args=(sym, options, workdir))
+                    proc.start()
+                    running[sym] = (proc, workdir, time.time())
+                time.sleep(0.05)
+                for sym, (proc, workdir, start) in list(running.items()):
+                    elapsed = time.time() - start
+                    if proc.is_alive():
+                        if timeout is None or elapsed < timeout:
+                            continue
+                        try:
+                            os.killpg(proc.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                        proc.join()
+                        entry = {"symbol": sym, "status": "timeout", "error": f"exceeded {timeout} s"}
+                    else:
+                        proc.join()
+                        entry = collect(proc, workdir, sym)
+                    entry["seconds"] = round(elapsed, 3)
+                    log.write(json.dumps(entry) + "\n")
+                    log.flush()
+                    done[sym] = entry
+                    shutil.rmtree(workdir, ignore_errors=True)
+                    del running[sym]
+                    print(f"{sym}: {entry['status']} ({entry['seconds']} s)", file=sys.stderr)
+    finally:
+        for proc, _, _ in running.values():
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        shutil.rmtree(scratch, ignore_errors=True)
+    return done
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python Scheduler.py <symbols_file> [--arc] [--relaxed] [--no-cache] [--stl] "
+              "[--triangulation fan|ear] [--binary] [--retry] [--jobs N] [--timeout SECONDS] [--memory MB] [--checkpoint FILE]")
+        sys.exit(1)
+    args = sys.argv[2:]
+    def value(flag, default):
+        return args[args.index(flag) + 1] if flag in args else default
+    source = "arc" if "--arc" in args else "systre"
+    mode = "relaxed" if "--relaxed" in args else "barycentric"
+    label = "arc" if source == "arc" else mode
+    options = {
+        "source": source,
+        "mode": mode,
+        "cache": source != "arc" and "--no-cache" not in args,
+        "stl": "--stl" in args,
+        "triangulation": triangulation_mode(args),
+        "binary": "--binary" in args,
+        "memory": int(value("--memory", 0)),
+    }
+    jobs = int(value("--jobs", os.cpu_count()))
+    timeout = float(value("--timeout", 0)) or None
+    checkpoint = value("--checkpoint", f"schedule-{label}.jsonl")
+
+    symbols = read_symbols(sys.argv[1])
+    done = schedule(symbols, options, jobs, timeout, checkpoint, "--retry" in args)
+    for stage, filename in output_files(label).items():
+        with open(filename, "w") as f:
+            for sym in symbols:
+                if done.get(sym, {}).get("result", {}).get(stage):
+                    f.write(sym + "\n")
+    write_margins({sym: done[sym]["margins"] for sym in symbols if "margins" in done.get(sym, {})}, margins_file(label))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import sys
+import json
+import numpy as np
+from Triangulate import Mesh, load_mesh, triangulation_mode
+from ExportSTL import stl_records, write_stl_header
+from MeshExport import FORMATS, write_mesh
+
+def supercell_cells(shape):
+    """Integer cell offsets of an N x M x K supercell, (N*M*K, 3)"""
+    return np.stack(np.meshgrid(*[np.arange(n) for n in shape], indexing="ij"), axis=-1).reshape(-1, 3)
+
+def write_supercell_stl(mesh, periods, shape, filename):
+    """Binary STL of an N x M x K supercell, streamed one tile at a time so that only the records of the unit
+    mesh are held in memory; normals do not change under translation, so they are computed once"""
+    offsets = supercell_cells(shape) @ np.asarray(periods, dtype=float)
+    records = stl_records(mesh.triangle_vertices())
+    base = records["vertices"].astype(float)
+    with open(filename, "wb") as f:
+        write_stl_header(f, len(offsets) * len(records))
+        for offset in offsets:
+            records["vertices"] = base + offset
+            records.tofile(f)
+
+def tile_mesh(mesh, periods, shape):
+    """Mesh of an N x M x K supercell, made by translating the unit mesh by every cell offset at once.
+    Face vertices meeting at the seams are welded by their (vertex, cell) key shifted by the offset of the
+    tile; polygon centers and band axis points are kept apart.  Face IDs of tile t are shifted by t times the
+    number of faces, and the vertices of the first tile keep their order."""
+    cells = supercell_cells(shape)
+    tiles, n = len(cells), len(mesh.vertices)
+    vertices = (mesh.vertices[None] + (cells @ np.asarray(periods, dtype=float))[:, None]).reshape(-1, 3)
+    keys = np.broadcast_to(mesh.keys, (tiles, n, 4)).copy()
+    keys[:, :, 1:] += cells[:, None]
+    unwelded = keys[:, :, 0] < 0
+    keys[unwelded] = 0
+    keys[:, :, 0][unwelded] = -1 - np.arange(tiles * n).reshape(tiles, n)[unwelded]
+    _, first, inverse = np.unique(keys.reshape(-1, 4), axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    ids = rank[inverse.reshape(-1)].reshape(tiles, n)
+
+    triangles = ids[:, mesh.triangles].reshape(-1, 3)
+    num_faces = int(mesh.faces.max()) + 1 if len(mesh.faces) else 0
+    faces = (mesh.faces[None] + np.arange(tiles)[:, None] * num_faces).ravel()
+    boundaries = [ids[t, b].tolist() for t in range(tiles) for b in mesh.boundaries]
+    return Mesh(vertices[first[order]], triangles, faces, np.tile(mesh.bands, tiles), boundaries,
+                np.tile(mesh.ears, tiles), keys.reshape(-1, 4)[first[order]])
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 4 or args[0].startswith("--"):
+        print("Usage: python Supercell.py <network_name> N M K [--format stl|ply|obj|glb] "
+              "[--triangulation fan|ear]")
+        sys.exit(1)
+    network_name = args[0]
+    shape = [int(x) for x in args[1:4]]
+    fmt = args[args.index("--format") + 1] if "--format" in args else "stl"
+    if fmt != "stl" and fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt}, expected stl or one of {FORMATS}")
+
+    with open("surface_data.json") as f:
+        periods = json.load(f)["periods"]
+    mesh = load_mesh("surface_data.json", triangulation_mode(args))
+    modelfile = f"models/{network_name}-{'x'.join(map(str, shape))}.{fmt}"
+    if fmt == "stl":
+        # STL has no shared vertices, so nothing is welded
+        write_supercell_stl(mesh, periods, shape, modelfile)
+        print(f"{len(mesh.triangles) * np.prod(shape)} triangles")
+        return
+    tiled = tile_mesh(mesh, periods, shape)
+    welded = len(mesh.vertices) * np.prod(shape) - len(tiled.vertices)
+    print(f"{len(tiled.vertices)} vertices ({welded} welded at the seams), {len(tiled.triangles)} triangles")
+    write_mesh(tiled, modelfile, fmt)
+
+if __name__ == "__main__":
+    main()
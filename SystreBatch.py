@@ -0,0 +1,130 @@
+import sys
+import os
+import json
+import tempfile
+import subprocess
+from CgdIndex import CgdReader
+from Halfedges import SYSTRE_JAR, SYSTRE_MODES, parse_systre, build_network
+from SystreCache import SystreCache
+
+def read_symbols(filename):
+    with open(filename) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("!")]
+
+def split_records(stream):
+    """Split the combined Systre output into (structure number, lines) records while it is being produced.
+    The last record is cut off if Systre died in the middle of it (see finished)."""
+    number, record = None, []
+    for line in stream:
+        stripped = line.strip()
+        if stripped.startswith("Structure #"):
+            if number is not None:
+                yield number, record
+            number = int(stripped[len("Structure #"):].split()[0])
+            record = [line]
+        elif number is not None:
+            record.append(line)
+            if stripped.startswith("Finished structure #"):
+                yield number, record
+                number, record = None, []
+    if number is not None:
+        yield number, record
+
+def finished(lines):
+    return bool(lines) and lines[-1].strip().startswith("Finished structure #")
+
+def systre_command(cgd_file, mode="barycentric"):
+    return ["java", "-cp", SYSTRE_JAR, "org.gavrog.apps.systre.SystreCmdline"] + SYSTRE_MODES[mode] + [cgd_file]
+
+def network_record(lines, max_vertices=None):
+    record = parse_systre(lines)
+    if max_vertices is not None and len(record["positions"]) > max_vertices:
+        raise ValueError(f"oversize ({len(record['positions'])} vertices)")
+    return build_network(record)
+
+def run_batch(symbols, mode="barycentric", max_bytes=None, max_vertices=None, large=(), workdir=None, cache=None):
+    """Run Systre once over many networks and yield (symbol, network data, error) for each of them.
+    Networks found in the cache are not sent to Systre.  Only records that reach their "Finished structure"
+    line count as done.  If the JVM dies in the middle of a batch, the first unfinished structure is reported
+    as failed and Systre is restarted on the ones after it."""
+    reader = CgdReader()
+    pending = []
+    try:
+        for sym in symbols:
+            size = reader.size(sym)
+            if size is None:
+                yield sym, None, "not found in the cgd database"
+            elif sym in large or (max_bytes is not None and size > max_bytes):
+                yield sym, None, f"oversize ({size} bytes)"
+            else:
+                cached = cache.get(sym, mode) if cache is not None else None
+                if cached is None:
+                    pending.append(sym)
+                    continue
+                try:
+                    yield sym, network_record(cached.splitlines(), max_vertices), None
+                except Exception as ex:
+                    yield sym, None, str(ex)
+        while pending:
+            with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+                cgd_file = os.path.join(tmpdir, "batch.cgd")
+                with open(cgd_file, "w") as f:
+                    for sym in pending:
+                        f.write(reader.block(sym).rstrip("\n") + "\n\n")
+                done = set()
+                proc = subprocess.Popen(systre_command(cgd_file, mode), stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True)
+                try:
+                    for number, lines in split_records(proc.stdout):
+                        if not 1 <= number <= len(pending) or not finished(lines):
+                            continue
+                        sym = pending[number - 1]
+                        done.add(number - 1)
+                        if cache is not None:
+                            cache.put(sym, mode, "".join(lines))
+                        try:
+                            yield sym, network_record(lines, max_vertices), None
+                        except Exception as ex:
+                            yield sym, None, str(ex)
+                    proc.wait()
+                finally:
+                    if proc.poll() is None:
+                        proc.kill()
+                        proc.wait()
+            missing = [i for i in range(len(pending)) if i not in done]
+            if not missing:
+                break
+            if proc.returncode == 0:
+                for i in missing:
+                    yield pending[i], None, "missing from Systre output"
+                break
+            yield pending[missing[0]], None, f"Systre exited with status {proc.returncode}"
+            pending = [pending[i] for i in missing[1:]]
+    finally:
+        reader.close()
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python SystreBatch.py <symbols_file> <output_dir> [--relaxed] [--no-cache] [--max-bytes N] [--max-vertices N]")
+        sys.exit(1)
+    symbols = read_symbols(sys.argv[1])
+    outdir = sys.argv[2]
+    args = sys.argv[3:]
+    mode = "relaxed" if "--relaxed" in args else "barycentric"
+    cache = None if "--no-cache" in args else SystreCache(SYSTRE_JAR)
+    max_bytes = int(args[args.index("--max-bytes") + 1]) if "--max-bytes" in args else None
+    max_vertices = int(args[args.index("--max-vertices") + 1]) if "--max-vertices" in args else None
+    large = set(read_symbols("symbols-large.dat")) if os.path.exists("symbols-large.dat") else set()
+    os.makedirs(outdir, exist_ok=True)
+    for sym, data, error in run_batch(symbols, mode, max_bytes, max_vertices, large, cache=cache):
+        if data is None:
+            print(f"{sym}: {error}")
+            continue
+        with open(os.path.join(outdir, f"{sym}.json"), "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"{sym}: ok")
+    if cache is not None:
+        print("Cache:", cache.close())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import sys
+import os
+import re
+import json
+import fcntl
+import hashlib
+import tempfile
+from Barycentric import load_arc
+from CgdIndex import CgdReader
+
+CACHE_DIR = ".systre_cache"
+MAX_BYTES = 256 * 1024 * 1024
+
+def jar_version(jar):
+    m = re.search(r"Systre-(.+)\.jar$", os.path.basename(jar))
+    return m.group(1) if m else os.path.basename(jar)
+
+def complete(text):
+    return "Finished structure #" in text
+
+def write_atomic(directory, path, text):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+class SystreCache:
+    """Content-addressed store of Systre outputs, keyed by arc checksum, Systre version and embedding mode.
+    Only complete outputs (ending a structure with its "Finished structure" line) are stored or returned.
+    Entries are evicted least recently used first once the total size exceeds max_bytes."""
+
+    def __init__(self, jar, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = jar_version(jar)
+        self.checksums = None
+        self.reader = None
+        self.total = None
+        self.counts = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def checksum(self, name):
+        if self.checksums is None:
+            self.checksums = {k: e.get("checksum", "") for k, e in load_arc().items()}
+        if self.checksums.get(name):
+            return "arc:" + self.checksums[name]
+        # networks missing from the arc database are addressed by their cgd block
+        if self.reader is None:
+            self.reader = CgdReader()
+        block = self.reader.block(name)
+        if block is None:
+            return None
+        return "cgd:" + hashlib.sha1(block.encode()).hexdigest()
+
+    def path(self, name, mode):
+        checksum = self.checksum(name)
+        if checksum is None:
+            return None
+        key = hashlib.sha256(f"{checksum}:{self.version}:{mode}".encode()).hexdigest()[:32]
+        return os.path.join(self.directory, key + ".out")
+
+    def get(self, name, mode):
+        path = self.path(name, mode)
+        try:
+            with open(path) as f:
+                text = f.read()
+        except (OSError, TypeError):
+            text = None
+        if text is not None and complete(text):
+            try:
+                # bumps the entry for LRU eviction; fails if another process evicted it meanwhile
+                os.utime(path)
+                self.counts["hits"] += 1
+                return text
+            except OSError:
+                pass
+        self.counts["misses"] += 1
+        return None
+
+    def put(self, name, mode, text):
+        path = self.path(name, mode)
+        if path is None or not complete(text):
+            return
+        if self.total is None:
+            self.total = sum(size for _, size, _ in self.entries())
+        try:
+            self.total -= os.path.getsize(path)
+        except OSError:
+            pass
+        write_atomic(self.directory, path, text)
+        self.total += os.path.getsize(path)
+        self.counts["stores"] += 1
+        # the running total misses the entries of other processes, so it is refreshed by the scan in evict
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".out"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        self.total = total
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.total = total
+            self.counts["evictions"] += 1
+
+    def stats_file(self):
+        return os.path.join(self.directory, "stats.json")
+
+    def stats(self):
+        try:
+            with open(self.stats_file()) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        return {k: stats.get(k, 0) + v for k, v in self.counts.items()}
+
+    def save_stats(self):
+        """Add the counts of this process to stats.json, under a lock shared by all processes using the cache"""
+        with open(os.path.join(self.directory, "stats.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self.stats()
+            write_atomic(self.directory, self.stats_file(), json.dumps(stats))
+        self.counts = {k: 0 for k in self.counts}
+        return stats
+
+    def close(self):
+        stats = self.save_stats()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        return stats
+
+def main():
+    from Halfedges import SYSTRE_JAR
+    if len(sys.argv) < 2 or sys.argv[1] not in ("--stats", "--clear"):
+        print("Usage: python SystreCache.py [--stats | --clear]")
+        sys.exit(1)
+    cache = SystreCache(SYSTRE_JAR)
+    if sys.argv[1] == "--clear":
+        for _, _, path in cache.entries():
+            os.remove(path)
+        if os.path.exists(cache.stats_file()):
+            os.remove(cache.stats_file())
+        return
+    entries = cache.entries()
+    stats = cache.stats()
+    print(f"Entries: {len(entries)} ({sum(size for _, size, _ in entries)} bytes, cap {cache.max_bytes})")
+    for k, v in stats.items():
+        print(f"{k.capitalize()}: {v}")
+
+if __name__ == "__main__":
+    main()
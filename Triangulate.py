@@ -0,0 +1,319 @@
+import sys
+import os
+import json
+import numpy as np
+
+SURFACE_FILE = "surface_data.json"
+MODES = ["fan", "ear"]
+PLANAR_TOL = 1e-2
+# bumped whenever the triangulation changes, so that cached meshes are rebuilt
+MESH_VERSION = 2
+
+def find_dup(keys):
+    """Two consecutive face vertices that the face walks back along, found by their (vertex, cell) keys;
+    returns i1, j1 (the pair) and i2, j2 (the same pair reversed), or None.
+    A reversed segment of any length contains a reversed pair, so pairs are all that needs to be searched."""
+    n = len(keys)
+    if n < 4:
+        return None
+    pairs = {}
+    for j in range(n):
+        pairs.setdefault((keys[j], keys[(j+1)%n]), []).append(j)
+    for i in range(n):
+        for j in pairs.get((keys[(i+1)%n], keys[i]), ()):
+            if j != i:
+                return i, (i+1)%n, j, (j+1)%n
+    return None
+
+def cross2(a, b):
+    return a[0] * b[1] - a[1] * b[0]
+
+def is_simple(points):
+    """Whether no two non-adjacent edges of a planar polygon touch"""
+    n = len(points)
+    edges = [(points[i], points[(i+1)%n]) for i in range(n)]
+    for i in range(n):
+        for j in range(i + 2, n):
+            if i == 0 and j == n - 1:
+                continue
+            (p1, q1), (p2, q2) = edges[i], edges[j]
+            d1 = cross2(q1 - p1, p2 - p1)
+            d2 = cross2(q1 - p1, q2 - p1)
+            d3 = cross2(q2 - p2, p1 - p2)
+            d4 = cross2(q2 - p2, q1 - p2)
+            if d1 * d2 <= 0 and d3 * d4 <= 0:
+                return False
+    return True
+
+def ear_clip(points, tol=1e-9):
+    """Triangles (index triples, in the order of the polygon) of a simple planar polygon, or None"""
+    n = len(points)
+    area = sum(cross2(points[i], points[(i+1)%n]) for i in range(n)) / 2
+    scale = np.max(np.ptp(points, axis=0)) ** 2
+    if abs(area) <= tol * scale or not is_simple(points):
+        return None
+    orient = np.sign(area)
+    remaining = list(range(n))
+    triangles = []
+    while len(remaining) > 3:
+        m = len(remaining)
+        for k in range(m):
+            a, b, c = remaining[k-1], remaining[k], remaining[(k+1)%m]
+            pa, pb, pc = points[a], points[b], points[c]
+            if orient * cross2(pb - pa, pc - pb) <= tol * scale:
+                continue  # reflex or flat corner
+            inside = False
+            for r in remaining:
+                if r in (a, b, c):
+                    continue
+                p = points[r]
+                if (orient * cross2(pb - pa, p - pa) >= -tol * scale and orient * cross2(pc - pb, p - pb) >= -tol * scale
+                        and orient * cross2(pa - pc, p - pc) >= -tol * scale):
+                    inside = True
+                    break
+            if not inside:
+                triangles.append([a, b, c])
+                remaining.pop(k)
+                break
+        else:
+            return None
+    triangles.append(remaining)
+    return triangles
+
+def planar_projection(points, tol=PLANAR_TOL):
+    """2D coordinates of points in their best-fitting plane, or None if they are not nearly planar
+    (thickness above tol times the width, measured by the singular values)"""
+    centered = points - np.mean(points, axis=0)
+    _, s, vh = np.linalg.svd(centered)
+    if s[2] > tol * s[0]:
+        return None
+    return centered @ vh[:2].T
+
+class Mesh:
+    """Indexed triangle mesh of a surface: vertex positions (N,3), triangles (M,3), the face each triangle
+    comes from, whether that face is a band and whether the triangle was ear-clipped (instead of fanned from a
+    polygon center), the boundary loop (vertex indices) of every trivial face, and the (vertex, cell) key of
+    every welded vertex (vertex -1 for polygon centers and band axis points)"""
+
+    def __init__(self, vertices, triangles, faces, bands, boundaries, ears=None, keys=None):
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.faces = np.asarray(faces, dtype=np.int64)
+        self.bands = np.asarray(bands, dtype=bool)
+        self.boundaries = boundaries
+        self.ears = np.zeros(len(self.triangles), dtype=bool) if ears is None else np.asarray(ears, dtype=bool)
+        if keys is None:
+            keys = np.tile([-1, 0, 0, 0], (len(self.vertices), 1))
+        self.keys = np.asarray(keys, dtype=np.int64).reshape(-1, 4)
+
+    def counts(self):
+        """Number of triangles made by each triangulation method"""
+        return {"ear": int(self.ears.sum()), "fan": int((~self.ears).sum())}
+
+    def triangle_vertices(self):
+        """Corner positions of all triangles, (M,3,3)"""
+        return self.vertices[self.triangles]
+
+    def save(self, filename, stamp):
+        lengths = [len(b) for b in self.boundaries]
+        np.savez(filename, vertices=self.vertices, triangles=self.triangles, faces=self.faces, bands=self.bands,
+                 ears=self.ears, keys=self.keys,
+                 boundaries=np.array([i for b in self.boundaries for i in b], dtype=np.int64),
+                 lengths=np.array(lengths, dtype=np.int64), stamp=np.array(stamp, dtype=np.int64))
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as f:
+            offsets = np.cumsum(f["lengths"])
+            boundaries = [b.tolist() for b in np.split(f["boundaries"], offsets[:-1])] if len(offsets) else []
+            mesh = cls(f["vertices"], f["triangles"], f["faces"], f["bands"], boundaries, f["ears"], f["keys"])
+            return mesh, f["stamp"].tolist()
+
+def clashing_faces(mesh):
+    """Faces with an ear-clipped triangle that intersects another triangle of the mesh (adjacent triangles,
+    sharing a welded corner, excluded as in CheckEmbed.py)"""
+    from CheckEmbed import candidate_pairs, weld_vertices, adjacent_pairs, tri_tri_intersect_batch
+    triangles = mesh.triangle_vertices()
+    pairs = candidate_pairs(triangles)
+    pairs = pairs[np.any(mesh.ears[pairs], axis=1)]
+    adjacent = np.isin(pairs[:, 0] * len(triangles) + pairs[:, 1], adjacent_pairs(weld_vertices(triangles)))
+    hits = pairs[tri_tri_intersect_batch(triangles[pairs], adjacent)].ravel()
+    return set(mesh.faces[hits[mesh.ears[hits]]].tolist())
+
+def triangulate(data, mode="fan"):
+    """Triangulate all faces of a surface (trivial faces as polygons, the others as bands) into an indexed mesh.
+    Face vertices are welded by their (vertex, cell) key; polygon centers and band axis points are not shared.
+    Polygons are fanned from their center, or in "ear" mode ear-clipped into n-2 triangles when they are
+    planar (within PLANAR_TOL of their size) and their projection is simple, falling back to the fan otherwise.
+    The clipped triangles lie over the projected polygon, so they cannot cross each other; faces whose clipped
+    triangles cross a neighbouring triangle are fanned again, until no clipped triangle crosses any other."""
+    mesh = triangulate_faces(data, mode)
+    fanned = set()
+    while mode == "ear":
+        clashing = clashing_faces(mesh)
+        if not clashing:
+            break
+        fanned |= clashing
+        mesh = triangulate_faces(data, mode, fanned)
+    return mesh
+
+def triangulate_faces(data, mode="fan", fanned=()):
+    """Mesh of all faces, with the faces in fanned always fanned"""
+    periods = data["periods"]
+    vertices = data["vertices"]
+    halfedges = data["halfedges"]
+
+    points = []
+    keys = []
+    index = {}
+    triangles = []
+    face_ids = []
+    bands = []
+    boundaries = []
+    ears = []
+
+    def point(key, v):
+        if key is None or key not in index:
+            points.append(v)
+            keys.append((-1, 0, 0, 0) if key is None else key)
+            if key is None:
+                return len(points) - 1
+            index[key] = len(points) - 1
+        return index[key]
+
+    def draw_polygon(ids, f, band):
+        if mode == "ear" and f not in fanned and len(set(ids)) == len(ids):
+            projected = planar_projection(np.array([points[i] for i in ids]))
+            clipped = None if projected is None else ear_clip(projected)
+            if clipped is not None:
+                for tri in clipped:
+                    triangles.append([ids[k] for k in tri])
+                    face_ids.append(f)
+                    bands.append(band)
+                    ears.append(True)
+                return
+        center = point(None, np.mean([points[i] for i in ids], axis=0))
+        n = len(ids)
+        for i in range(n):
+            triangles.append([center, ids[i], ids[(i+1)%n]])
+            face_ids.append(f)
+            bands.append(band)
+            ears.append(False)
+
+    def face_points(face):
+        cell = [0, 0, 0]
+        ids = []
+        for h_idx in face:
+            h = halfedges[h_idx]
+            v_idx = h[0]
+            v = np.array(vertices[v_idx]) + np.dot(cell, periods)
+            ids.append(point((v_idx, *cell), v))
+            cell = [c + d for c, d in zip(cell, h[2])]
+        return ids, cell
+
+    def draw_band(face, f):
+        ids, cell = face_points(face)
+        dir = np.dot(cell, periods)
+        dir = np.array(dir)
+        dir = dir / np.linalg.norm(dir)
+        # Project all vertices onto the line through the center with direction dir
+        center = np.mean([points[i] for i in ids], axis=0)
+        projected = []
+        for i in ids:
+            t = np.dot(points[i] - center, dir)
+            projected.append(point(None, center + t * dir))
+        for i in range(len(ids)-1):
+            draw_polygon([ids[i], ids[i+1], projected[i+1], projected[i]], f, True)
+
+    def draw_face(face, f):
+        ids, _ = face_points(face)
+        boundaries.append(list(ids))
+        while True:
+            dup = find_dup(ids)
+            if not dup:
+                break
+            i1, j1, i2, j2 = dup
+            n = len(ids)
+            # Rotate ids so that i1 == 1
+            shift = (i1 - 1) % n
+            ids = ids[shift:] + ids[:shift]
+            # Update indices after rotation
+            i1 = 1
+            j1 = (j1 - shift) % n
+            i2 = (i2 - shift) % n
+            j2 = (j2 - shift) % n
+            # Ensure i1 < j1 < i2 < j2
+            if i2 < j1:
+                i1, j1, i2, j2 = i2, j2, i1, j1
+            # Triangulate polygons for the two duplicate sublists
+            draw_polygon([ids[k%len(ids)] for k in range(i1-1, j1+2)], f, False)
+            draw_polygon([ids[k%len(ids)] for k in range(i2-1, j2+2)], f, False)
+            # Remove the duplicate sublists (second occurrence first)
+            for _ in range(i2, j2+1):
+                ids.pop(i2 % len(ids))
+            for _ in range(i1, j1+1):
+                ids.pop(i1 % len(ids))
+        # Triangulate polygon for remaining vertices
+        if len(ids) > 2:
+            draw_polygon(ids, f, False)
+
+    for f, face in enumerate(data["faces"]):
+        cell = [0, 0, 0]
+        for h_idx in face:
+            h = halfedges[h_idx]
+            cell = [c + d for c, d in zip(cell, h[2])]
+        if all(c == 0 for c in cell):
+            draw_face(face, f)
+        else:
+            draw_band(face, f)
+
+    return Mesh(points, triangles, face_ids, bands, boundaries, ears, keys)
+
+def mesh_file(filename, mode="fan"):
+    suffix = ".mesh.npz" if mode == "fan" else f".{mode}.mesh.npz"
+    return os.path.splitext(filename)[0] + suffix
+
+def file_stamp(filename):
+    st = os.stat(filename)
+    return [st.st_size, st.st_mtime_ns, MESH_VERSION]
+
+_meshes = {}
+
+def load_mesh(filename=SURFACE_FILE, mode="fan"):
+    """Mesh of a surface file, cached in memory and next to the file, and rebuilt when the file changes"""
+    stamp = file_stamp(filename)
+    key = (os.path.abspath(filename), mode)
+    if key in _meshes and _meshes[key][1] == stamp:
+        return _meshes[key][0]
+    try:
+        mesh, cached = Mesh.load(mesh_file(filename, mode))
+    except (OSError, ValueError, KeyError):
+        cached = None
+    if cached != stamp:
+        with open(filename) as f:
+            mesh = triangulate(json.load(f), mode)
+        try:
+            mesh.save(mesh_file(filename, mode), stamp)
+        except OSError:
+            pass
+    _meshes[key] = (mesh, stamp)
+    return mesh
+
+def triangulation_mode(args):
+    """Value of the --triangulation option"""
+    mode = args[args.index("--triangulation") + 1] if "--triangulation" in args else "fan"
+    if mode not in MODES:
+        raise ValueError(f"unknown triangulation mode {mode}, expected one of {MODES}")
+    return mode
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if args and not args[0].startswith("--") else SURFACE_FILE
+    for mode in MODES:
+        mesh = load_mesh(filename, mode)
+        counts = ", ".join(f"{n} {method}" for method, n in mesh.counts().items())
+        print(f"{mode}: {len(mesh.vertices)} vertices, {len(mesh.triangles)} triangles ({counts}), "
+              f"{int(mesh.bands.sum())} in bands")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1 @@
-while read -r sym; do
-  ./export_stl.sh "$sym"
-done
\ No newline at end of file
+python3 Pipeline.py - --export "$@"
\ No newline at end of file
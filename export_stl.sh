@@ -1,7 +1,3 @@
 #!/bin/sh
 sym="$1"
-python3 Halfedges.py "$sym" >/dev/null 2>&1
-python3 DFSNormal.py >/dev/null 2>&1
-python3 MakeFaces.py >/dev/null 2>&1
-python3 ExportSTL.py "$sym" >/dev/null 2>&1
-rm -f *.json
\ No newline at end of file
+echo "$sym" | python3 Pipeline.py - --export >/dev/null 2>&1
\ No newline at end of file
@@ -1,2 +1,2 @@
 #!/bin/sh
-grep -i '^ *NAME ' rcsr3d.cgd | awk '{print $2}' | tee symbols.dat
\ No newline at end of file
+python3 CgdIndex.py --names | tee symbols.dat
\ No newline at end of file